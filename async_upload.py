@@ -0,0 +1,238 @@
+import ssl
+import json
+import time
+import asyncio
+import threading
+import urllib.parse
+import concurrent.futures
+
+from engine import (
+    CURRENT_SETTINGS, DEFAULT_SETTINGS, RETRY_POLICY, QUOTA, SERVICE_CACHE, SHAPER, HttpError,
+    build_video_body, make_chunk_sizer, new_upload_session, load_upload_session, save_upload_session, clear_upload_session
+)
+from metrics import METRICS
+
+# =============================================================================
+# ASYNC RESUMABLE UPLOAD TRANSPORT
+# =============================================================================
+# Tự nói giao thức resumable upload của YouTube trên asyncio streams (không dùng
+# googleapiclient/httplib2): mọi upload là coroutine trên MỘT event loop ở luồng riêng,
+# nên hàng trăm upload song song không cần hàng trăm luồng. File được đọc từng khối
+# READ_BLOCK và đẩy thẳng ra socket, bộ nhớ mỗi upload ~1 khối thay vì cả chunk.
+# Phiên upload lưu chung định dạng upload_session.json với transport thread.
+
+UPLOAD_URL = "https://www.googleapis.com/upload/youtube/v3/videos"
+UPLOAD_PARTS = "snippet,status,recordingDetails"
+READ_BLOCK = 1024 * 1024
+IO_TIMEOUT = 120
+PAUSE_POLL = 0.5
+
+READ_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="upload-read")
+
+def http_error(status, headers, body, url):
+    # Dựng HttpError giống googleapiclient để RetryPolicy / http_error_reason dùng lại được.
+    import httplib2
+    return HttpError(httplib2.Response(dict(headers, status=str(status))), body, uri=url)
+
+class HttpConnection:
+    # HTTP/1.1 tối giản: keep-alive, body theo Content-Length hoặc chunked.
+    def __init__(self, url, ssl_context=None):
+        u = urllib.parse.urlsplit(url)
+        self.host = u.hostname
+        self.port = u.port or (443 if u.scheme == "https" else 80)
+        self.ssl = (ssl_context or ssl.create_default_context()) if u.scheme == "https" else None
+        self.netloc = u.netloc
+        self.reader = self.writer = None
+
+    def close(self):
+        if self.writer: self.writer.close()
+        self.reader = self.writer = None
+
+    async def _open(self):
+        if self.writer is None or self.writer.is_closing():
+            self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port, ssl=self.ssl), IO_TIMEOUT)
+
+    async def request(self, method, url, headers, body=b"", length=None):
+        # body: bytes hoặc async iterator trả về bytes (khi đó phải có length).
+        u = urllib.parse.urlsplit(url)
+        path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+        await self._open()
+        try:
+            length = len(body) if isinstance(body, (bytes, bytearray)) else length
+            head = [f"{method} {path} HTTP/1.1", f"Host: {self.netloc}", f"Content-Length: {length}"]
+            head += [f"{k}: {v}" for k, v in headers.items()]
+            self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+            if isinstance(body, (bytes, bytearray)): self.writer.write(body)
+            else:
+                async for block in body:
+                    self.writer.write(block)
+                    await asyncio.wait_for(self.writer.drain(), IO_TIMEOUT)
+            await asyncio.wait_for(self.writer.drain(), IO_TIMEOUT)
+            return await asyncio.wait_for(self._read_response(method), IO_TIMEOUT)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError, asyncio.TimeoutError) as e:
+            self.close()
+            raise ConnectionError(f"{type(e).__name__}: {e}") from e
+        except BaseException:
+            self.close(); raise
+
+    async def _read_response(self, method):
+        line = await self.reader.readline()
+        if not line: raise ConnectionError("Connection closed by server")
+        status = int(line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""): break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                n = int((await self.reader.readline()).split(b";")[0], 16)
+                if n == 0: await self.reader.readline(); break
+                parts.append(await self.reader.readexactly(n)); await self.reader.readexactly(2)
+            data = b"".join(parts)
+        elif "content-length" in headers: data = await self.reader.readexactly(int(headers["content-length"]))
+        elif status in (204, 304) or method == "HEAD": data = b""
+        else: data = await self.reader.read(); headers["connection"] = "close"
+        if headers.get("connection", "").lower() == "close": self.close()
+        return status, headers, data
+
+async def file_blocks(path, offset, length, flow=None, weight=1.0):
+    loop = asyncio.get_running_loop()
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while length > 0:
+            block = await loop.run_in_executor(READ_POOL, f.read, min(READ_BLOCK, length))
+            if not block: raise OSError(f"{path} is shorter than expected")
+            length -= len(block)
+            d = SHAPER.delay(flow, len(block), weight)
+            if d > 0: await asyncio.sleep(d)
+            yield block
+
+def received_bytes(headers):
+    # Header Range của 308 là "bytes=0-N" (đã nhận N+1 byte); không có = chưa nhận byte nào.
+    r = headers.get("range")
+    return int(r.rsplit("-", 1)[1]) + 1 if r else 0
+
+async def wait_gate(pause_event, progress_callback):
+    # Tạm dừng kiểu cooperative: coroutine nhường loop thay vì chặn luồng bằng pause_event.wait().
+    if pause_event is None or pause_event.is_set(): return
+    progress_callback("Paused...")
+    while not pause_event.is_set(): await asyncio.sleep(PAUSE_POLL)
+    progress_callback("Resuming...")
+
+class AsyncTransport:
+    def __init__(self, base_url=None, max_uploads=None, ssl_context=None):
+        self.base_url = base_url
+        self.max_uploads = max_uploads
+        self.ssl_context = ssl_context
+        self.loop = None
+        self.semaphore = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.loop: return self.loop
+            self.loop = asyncio.new_event_loop()
+            limit = self.max_uploads or int(CURRENT_SETTINGS.get("asyncMaxUploads", DEFAULT_SETTINGS["asyncMaxUploads"]))
+            self.semaphore = asyncio.Semaphore(max(1, limit))
+            threading.Thread(target=self.loop.run_forever, name="async-upload", daemon=True).start()
+            return self.loop
+
+    def submit(self, coro):
+        # Gọi từ luồng khác: -> concurrent.futures.Future.
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    def stop(self):
+        with self.lock:
+            if self.loop: self.loop.call_soon_threadsafe(self.loop.stop); self.loop = None
+
+    def upload_url(self):
+        # base_url cố định, hoặc suy ra từ apiEndpoint (server giả lập của bench/), mặc định Google.
+        if self.base_url: return self.base_url
+        endpoint = CURRENT_SETTINGS.get("apiEndpoint")
+        return endpoint.rstrip("/") + "/upload/youtube/v3/videos" if endpoint else UPLOAD_URL
+
+    async def access_token(self, account, secret):
+        creds = await asyncio.get_running_loop().run_in_executor(None, SERVICE_CACHE.credentials, account, secret)
+        if not creds: raise RuntimeError("Token Mismatch or login expired")
+        return creds.token
+
+    async def open_session(self, conn, account, secret, body, size):
+        url = f"{self.upload_url()}?uploadType=resumable&part={UPLOAD_PARTS}"
+        headers = {"Authorization": f"Bearer {await self.access_token(account, secret)}",
+                   "Content-Type": "application/json; charset=UTF-8",
+                   "X-Upload-Content-Length": str(size), "X-Upload-Content-Type": "video/*"}
+        status, rh, data = await conn.request("POST", url, headers, json.dumps(body).encode("utf-8"))
+        if status != 200 or "location" not in rh: raise http_error(status, rh, data, url)
+        return rh["location"]
+
+    async def put(self, conn, account, secret, uri, size, offset=None, length=0, path=None, flow=None, weight=1.0):
+        # offset=None: chỉ hỏi server đã nhận bao nhiêu byte.
+        headers = {"Authorization": f"Bearer {await self.access_token(account, secret)}"}
+        if offset is None:
+            headers["Content-Range"] = f"bytes */{size}"
+            status, rh, data = await conn.request("PUT", uri, headers)
+        else:
+            headers["Content-Range"] = f"bytes {offset}-{offset + length - 1}/{size}"
+            status, rh, data = await conn.request("PUT", uri, headers, file_blocks(path, offset, length, flow, weight), length)
+        if status in (200, 201): return None, json.loads(data or b"{}")
+        if status == 308: return received_bytes(rh), None
+        raise http_error(status, rh, data, uri)
+
+    async def upload(self, account, secret, video_data, publish_time, specific_category, progress_callback, pause_event, log_func, project=None, flow=None, weight=1.0, quota=None):
+        async with self.semaphore:
+            return await self._upload(account, secret, video_data, publish_time, specific_category, progress_callback, pause_event, log_func, project, flow, weight, quota)
+
+    async def _upload(self, account, secret, video_data, publish_time, specific_category, progress_callback, pause_event, log_func, project, flow, weight, quota):
+        body = build_video_body(video_data, publish_time, specific_category, log_func)
+        sizer = make_chunk_sizer()
+        folder = video_data['folder']; path = video_data['video']
+        sess = load_upload_session(folder, path, account)
+        if sess: log_func(f"   -> Resume upload session ({sess.get('offset', 0) * 100 // max(1, sess['size'])}% saved)"); offset = None
+        else: sess = new_upload_session(path, account, publish_time); offset = 0
+        size = sess['size']
+        conn = HttpConnection(self.upload_url(), self.ssl_context); resp = None; attempt = 0; restarted = False
+        def on_retry(n, cause, delay): progress_callback(f"Retry {n} ({cause}) in {delay:.0f}s...")
+
+        try:
+            while resp is None:
+                await wait_gate(pause_event, progress_callback)
+                try:
+                    if not sess['uri']:
+                        sess['uri'] = await self.open_session(conn, account, secret, body, size)
+                        if project: QUOTA.charge(project, "videos.insert", reservation=quota)
+                        sess['created'] = time.time(); sess['offset'] = offset = 0
+                        save_upload_session(folder, sess)
+                    if offset is None:
+                        offset, resp = await self.put(conn, account, secret, sess['uri'], size)
+                        continue
+                    n = min(sizer.current(), size - offset); t0 = time.monotonic()
+                    received, resp = await self.put(conn, account, secret, sess['uri'], size, offset, n, path, flow, weight)
+                    METRICS.observe("chunk_seconds", time.monotonic() - t0, transport="async", account=account)
+                    METRICS.inc("chunk_bytes_total", n if resp is not None else received - offset, transport="async", account=account)
+                    if resp is None:
+                        sizer.record(received - offset, time.monotonic() - t0)
+                        offset = sess['offset'] = received
+                        save_upload_session(folder, sess)
+                        progress_callback(f"Upload {offset * 100 // max(1, size)}%", offset, size)
+                    attempt = 0
+                except HttpError as e:
+                    if e.resp.status in (404, 410) and sess['uri'] and not restarted:
+                        # Phiên đã hết hạn trên server -> bỏ và mở phiên mới từ byte 0.
+                        log_func("   -> Upload session expired, starting a new one")
+                        clear_upload_session(folder); restarted = True
+                        sess['uri'] = None; sess['offset'] = offset = 0
+                        continue
+                    sizer.on_error(); offset = None if sess['uri'] else 0
+                    await asyncio.sleep(RETRY_POLICY.plan(e, attempt, account, on_retry)); attempt += 1
+                except Exception as e:
+                    sizer.on_error(); offset = None if sess['uri'] else 0
+                    await asyncio.sleep(RETRY_POLICY.plan(e, attempt, account, on_retry)); attempt += 1
+        finally: conn.close()
+
+        clear_upload_session(folder)
+        return resp.get("id")
+
+ASYNC_TRANSPORT = AsyncTransport()
@@ -0,0 +1,277 @@
+import os
+import re
+import ssl
+import json
+import time
+import random
+import argparse
+import threading
+import collections
+import http.server
+import datetime
+import subprocess
+import urllib.parse
+
+# =============================================================================
+# FAKE YOUTUBE DATA API
+# =============================================================================
+# Server giả lập phần API mà app dùng, để đo đường upload mà không đụng kênh thật /
+# không tốn quota thật. Trỏ app về đây bằng setting "apiEndpoint": "https://127.0.0.1:PORT".
+# Chạy HTTPS với chứng chỉ tự ký (googleapiclient luôn gửi upload qua https); client tin
+# chứng chỉ này qua biến môi trường HTTPLIB2_CA_CERTS (httplib2) và SSL_CERT_FILE (asyncio).
+#   POST /upload/youtube/v3/videos?uploadType=resumable  -> mở phiên (Location)
+#   PUT  <Location> + Content-Range                       -> 308 Range / 200 video
+#   POST /upload/youtube/v3/thumbnails/set                -> thumbnails.set
+#   POST /youtube/v3/playlistItems                        -> playlistItems.insert
+#   GET  /youtube/v3/playlists                            -> phân trang + ETag / 304
+# Lỗi giả lập: độ trễ mỗi request, giới hạn băng thông (mỗi kết nối + cả đường truyền),
+# từng đợt 5xx liên tiếp, rớt kết nối giữa body, và hết quota theo project giả.
+
+QUOTA_COSTS = {"videos.insert": 1600, "thumbnails.set": 50, "playlistItems.insert": 50, "playlists.list": 1}
+READ_BLOCK = 64 * 1024
+
+class TokenBucket:
+    # Giới hạn byte/s; rate 0 = không giới hạn. Dùng chung giữa các luồng.
+    def __init__(self, rate):
+        self.rate = rate
+        self.allowance = 0.0
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, n):
+        if not self.rate: return
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.stamp) * self.rate); self.stamp = now
+            self.allowance -= n
+            wait = -self.allowance / self.rate if self.allowance < 0 else 0
+        if wait: time.sleep(wait)
+
+class FakeYouTube:
+    def __init__(self, latency=0.0, jitter=0.0, bandwidth=0, link_bandwidth=0, error_rate=0.0, burst=1, drop_rate=0.0,
+                 quota_limit=0, playlists=3, page_size=50, seed=None):
+        self.latency = latency; self.jitter = jitter
+        self.bandwidth = bandwidth                   # byte/s mỗi request
+        self.link = TokenBucket(link_bandwidth)      # byte/s cả server
+        self.error_rate = error_rate; self.burst = burst; self.burst_left = 0
+        self.drop_rate = drop_rate
+        self.quota_limit = quota_limit; self.quota_used = 0
+        self.playlists = playlists; self.page_size = page_size
+        self.random = random.Random(seed)
+        self.sessions = {}
+        self.calls = collections.Counter()           # "op" / "op:status"
+        self.bytes_in = 0
+        self.videos = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    # --- Lỗi giả lập ---
+    def inject_5xx(self):
+        with self.lock:
+            if self.burst_left > 0: self.burst_left -= 1; return True
+            if self.error_rate and self.random.random() < self.error_rate: self.burst_left = self.burst - 1; return True
+            return False
+
+    def should_drop(self):
+        with self.lock: return bool(self.drop_rate) and self.random.random() < self.drop_rate
+
+    def charge(self, op):
+        with self.lock:
+            cost = QUOTA_COSTS[op]
+            if self.quota_limit and self.quota_used + cost > self.quota_limit: return False
+            self.quota_used += cost
+            return True
+
+    def sleep_latency(self):
+        with self.lock: d = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if d: time.sleep(d)
+
+    def stats(self):
+        with self.lock:
+            return {"calls": dict(self.calls), "api_calls": sum(v for k, v in self.calls.items() if ":" not in k),
+                    "bytes_in": self.bytes_in, "quota_used": self.quota_used, "videos": len(self.videos)}
+
+    # --- Chạy server ---
+    def start(self, port=0, host="127.0.0.1", certfile=None, keyfile=None):
+        fake = self
+        class Handler(FakeHandler): pass
+        Handler.fake = fake
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.scheme = "http"
+        if certfile:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER); ctx.load_cert_chain(certfile, keyfile)
+            # Bắt tay TLS trong luồng của từng kết nối, không chặn luồng accept.
+            self.server.socket = ctx.wrap_socket(self.server.socket, server_side=True, do_handshake_on_connect=False)
+            self.scheme = "https"
+        threading.Thread(target=self.server.serve_forever, name="fake-youtube", daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"{self.scheme}://{host}:{port}"
+
+    def stop(self):
+        if self.server: self.server.shutdown(); self.server.server_close(); self.server = None
+
+def make_certificate(folder, host="127.0.0.1"):
+    # Chứng chỉ tự ký cho host (SAN IP) -> (certfile, keyfile). Dùng cryptography nếu có, không thì openssl.
+    cert, key = os.path.join(folder, "fake-youtube.pem"), os.path.join(folder, "fake-youtube.key")
+    try:
+        import ipaddress
+        from cryptography import x509
+        from cryptography.x509.oid import NameOID
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+    except ImportError:
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1", "-nodes", "-days", "2",
+                        "-subj", f"/CN={host}", "-addext", f"subjectAltName=IP:{host}", "-keyout", key, "-out", cert],
+                       check=True, capture_output=True)
+        return cert, key
+    pkey = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    crt = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(pkey.public_key())
+           .serial_number(x509.random_serial_number()).not_valid_before(now - datetime.timedelta(hours=1)).not_valid_after(now + datetime.timedelta(days=2))
+           .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address(host))]), critical=False)
+           .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+           .sign(pkey, hashes.SHA256()))
+    with open(cert, "wb") as f: f.write(crt.public_bytes(serialization.Encoding.PEM))
+    with open(key, "wb") as f: f.write(pkey.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return cert, key
+
+def api_error(code, reason, message=""):
+    return {"error": {"code": code, "message": message or reason, "errors": [{"reason": reason, "domain": "youtube"}]}}
+
+class FakeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake = None
+
+    def log_message(self, *args): pass
+
+    def send_json(self, status, data=None, headers=None):
+        body = json.dumps(data).encode("utf-8") if data is not None else b""
+        self.send_response(status)
+        for k, v in (headers or {}).items(): self.send_header(k, v)
+        if data is not None: self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers(); self.wfile.write(body)
+
+    def read_body(self, throttle=False):
+        # Đọc body theo khối; throttle = áp giới hạn băng thông. Trả None nếu cố ý rớt kết nối giữa chừng.
+        n = int(self.headers.get("Content-Length") or 0)
+        drop_at = self.fake.random.randint(0, n) if throttle and n and self.fake.should_drop() else -1
+        parts = []; got = 0; t0 = time.monotonic()
+        while got < n:
+            block = self.rfile.read(min(READ_BLOCK, n - got))
+            if not block: raise ConnectionError("client closed")
+            got += len(block); parts.append(block)
+            if throttle:
+                self.fake.link.take(len(block))
+                if self.fake.bandwidth:
+                    ahead = got / self.fake.bandwidth - (time.monotonic() - t0)
+                    if ahead > 0: time.sleep(ahead)
+            if 0 <= drop_at <= got: self.close_connection = True; return None
+        with self.fake.lock: self.fake.bytes_in += got
+        return b"".join(parts)
+
+    def route(self, method):
+        u = urllib.parse.urlsplit(self.path); q = dict(urllib.parse.parse_qsl(u.query)); path = u.path
+        if path.endswith("/upload/youtube/v3/videos"):
+            if method == "POST" and "upload_id" not in q: return "videos.insert", q
+            if method == "PUT": return "videos.upload", q
+        if path.endswith("/thumbnails/set") and method == "POST": return "thumbnails.set", q
+        if path.endswith("/youtube/v3/playlistItems") and method == "POST": return "playlistItems.insert", q
+        if path.endswith("/youtube/v3/playlists") and method == "GET": return "playlists.list", q
+        return None, q
+
+    def handle_any(self, method):
+        fake = self.fake
+        op, q = self.route(method)
+        if op is None: self.read_body(); return self.send_json(404, api_error(404, "notFound", self.path))
+        fake.sleep_latency()
+        body = self.read_body(throttle=(op == "videos.upload"))
+        with fake.lock: fake.calls[op] += 1
+        if body is None: return  # Rớt kết nối giả lập.
+        status, data, headers = (503, api_error(503, "backendError"), None) if fake.inject_5xx() else getattr(self, "op_" + op.replace(".", "_"))(q, body)
+        with fake.lock: fake.calls[f"{op}:{status}"] += 1
+        self.send_json(status, data, headers)
+
+    def do_GET(self): self.handle_any("GET")
+    def do_POST(self): self.handle_any("POST")
+    def do_PUT(self): self.handle_any("PUT")
+
+    # --- Các API ---
+    def op_videos_insert(self, q, body):
+        fake = self.fake
+        if not fake.charge("videos.insert"): return 403, api_error(403, "quotaExceeded"), None
+        size = int(self.headers.get("X-Upload-Content-Length") or 0)
+        with fake.lock:
+            sid = f"u{len(fake.sessions) + 1}"
+            fake.sessions[sid] = {"size": size, "got": 0, "meta": json.loads(body or b"{}"), "done": None}
+        host = self.headers.get("Host") or "%s:%s" % self.server.server_address[:2]
+        return 200, None, {"Location": f"{fake.scheme}://{host}/upload/youtube/v3/videos?uploadType=resumable&upload_id={sid}"}
+
+    def op_videos_upload(self, q, body):
+        fake = self.fake
+        with fake.lock: s = fake.sessions.get(q.get("upload_id"))
+        if s is None: return 404, api_error(404, "notFound", "Upload session not found"), None
+        if s["done"]: return 200, s["done"], None
+        m = re.match(r"bytes (\*|(\d+)-(\d+))/(\d+|\*)", self.headers.get("Content-Range", ""))
+        if not m: return 400, api_error(400, "badRequest", "Missing Content-Range"), None
+        if m.group(2) is not None:
+            start, end = int(m.group(2)), int(m.group(3))
+            if start == s["got"] and end - start + 1 == len(body): s["got"] = end + 1  # Khác offset -> 308 để client đồng bộ lại.
+        if s["got"] >= s["size"]:
+            with fake.lock:
+                vid = f"VID{len(fake.videos) + 1:06d}"
+                s["done"] = fake.videos[vid] = {"kind": "youtube#video", "id": vid, "snippet": s["meta"].get("snippet", {}), "status": s["meta"].get("status", {})}
+            return 200, s["done"], None
+        return 308, None, {"Range": f"bytes=0-{s['got'] - 1}"} if s["got"] else {}
+
+    def op_thumbnails_set(self, q, body):
+        if not self.fake.charge("thumbnails.set"): return 403, api_error(403, "quotaExceeded"), None
+        if q.get("videoId") not in self.fake.videos: return 404, api_error(404, "videoNotFound"), None
+        return 200, {"kind": "youtube#thumbnailSetResponse", "items": [{"default": {"url": "http://localhost/thumb.jpg"}}]}, None
+
+    def op_playlistItems_insert(self, q, body):
+        if not self.fake.charge("playlistItems.insert"): return 403, api_error(403, "quotaExceeded"), None
+        item = json.loads(body or b"{}")
+        if item.get("snippet", {}).get("resourceId", {}).get("videoId") not in self.fake.videos: return 404, api_error(404, "videoNotFound"), None
+        return 200, dict(item, kind="youtube#playlistItem", id=f"PLI{time.monotonic_ns()}"), None
+
+    def op_playlists_list(self, q, body):
+        fake = self.fake
+        if not fake.charge("playlists.list"): return 403, api_error(403, "quotaExceeded"), None
+        etag = f'"pl-{fake.playlists}"'
+        if self.headers.get("If-None-Match") == etag: return 304, None, {"ETag": etag}
+        size = min(int(q.get("maxResults", 5)), fake.page_size); start = int(q.get("pageToken") or 0)
+        items = [{"kind": "youtube#playlist", "id": f"PL{i:04d}", "snippet": {"title": f"Playlist {i}"}} for i in range(start, min(start + size, fake.playlists))]
+        data = {"kind": "youtube#playlistListResponse", "etag": etag, "items": items, "pageInfo": {"totalResults": fake.playlists, "resultsPerPage": size}}
+        if start + size < fake.playlists: data["nextPageToken"] = str(start + size)
+        return 200, data, {"ETag": etag}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the fake YouTube Data API server on its own (Ctrl+C to stop).")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random 0..JITTER seconds per request")
+    parser.add_argument("--bandwidth", type=float, default=0, help="Upload bytes/s per request, 0 = unlimited")
+    parser.add_argument("--link", type=float, default=0, help="Upload bytes/s for the whole server, 0 = unlimited")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Chance a request starts a 503 burst")
+    parser.add_argument("--burst", type=int, default=1, help="Consecutive 503s per burst")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Chance an upload chunk connection is cut mid-body")
+    parser.add_argument("--quota", type=int, default=0, help="Quota units before quotaExceeded, 0 = unlimited")
+    parser.add_argument("--cert-dir", default=".", help="Where to write the self-signed certificate (default: current folder)")
+    args = parser.parse_args(argv)
+    cert, key = make_certificate(args.cert_dir)
+    fake = FakeYouTube(args.latency, args.jitter, args.bandwidth, args.link, args.error_rate, args.burst, args.drop_rate, args.quota).start(args.port, certfile=cert, keyfile=key)
+    print(f"Fake YouTube API on {fake.url} (settings: \"apiEndpoint\": \"{fake.url}\")", flush=True)
+    print(f"Trust it with: HTTPLIB2_CA_CERTS={cert} SSL_CERT_FILE={cert}", flush=True)
+    try:
+        while True: time.sleep(10); print(json.dumps(fake.stats()), flush=True)
+    except KeyboardInterrupt: fake.stop()
+
+if __name__ == "__main__":
+    main()
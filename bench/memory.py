@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+
+# =============================================================================
+# MEMORY BENCHMARK: mediaSource "read" vs "mmap"
+# =============================================================================
+# Upload nhiều video lớn song song (transport thread, chunk cố định) tới server giả lập
+# bench/fake_youtube.py và đo phía client: RSS đỉnh của process, CPU (user + sys) trên mỗi
+# GB đã upload, thông lượng. Mỗi biến thể chạy trong một process con riêng để RSS đỉnh
+# (ru_maxrss) không lẫn nhau; server chạy ở process thứ ba để bộ đệm nhận body của nó
+# không bị tính vào client.
+# RSS gồm 2 phần: RssAnon (bytes của từng chunk, bộ đệm) và RssFile (trang của file đang map,
+# thuộc page cache dùng chung, kernel thu hồi được). Trên Linux đọc /proc/self/status định kỳ
+# để lấy đỉnh của từng phần; nơi khác chỉ có ru_maxrss.
+
+REPO = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+BENCH = os.path.join(REPO, "bench")
+MB = 1024 * 1024
+VARIANTS = ["read", "mmap"]
+
+class RssSampler:
+    FIELDS = ("VmRSS", "RssAnon", "RssFile")
+
+    def __init__(self, interval=0.01):
+        self.interval = interval; self.peak = dict.fromkeys(self.FIELDS, 0)
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    key, _, val = line.partition(":")
+                    if key in self.peak: self.peak[key] = max(self.peak[key], int(val.split()[0]))
+        except OSError: pass
+
+    def _run(self):
+        while not self.stop.wait(self.interval): self.sample()
+
+    def __enter__(self): self.sample(); self.thread.start(); return self
+
+    def __exit__(self, *exc): self.stop.set(); self.thread.join(); self.sample()
+
+def run_child(variant, rows, size_mb, chunk_mb, url, timeout):
+    import uploads
+    work, jobs = uploads.make_workdir({"rows": rows, "files": 1, "size": size_mb * MB})
+    os.chdir(work)
+    try:
+        import engine
+        from metrics import METRICS
+        engine.CURRENT_SETTINGS.update(apiEndpoint=url, transport="thread", mediaSource=variant, maxWorkers=rows, maxPerAccount=1,
+                                       chunkMinMB=chunk_mb, chunkMaxMB=chunk_mb, quotaPerProject=10 ** 9, writeDoneJson=False,
+                                       bandwidthLimitMbps=0)
+        engine.POST_FIRST_DELAY = 0.0; engine.POST_RETRY_MIN = 0.0
+        eng = engine.UploadEngine()
+        # Mốc: engine + thư viện Google đã import, chưa upload gì.
+        import googleapiclient.discovery, googleapiclient.http
+        base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        base = RssSampler(); base.sample()
+        with RssSampler() as rss:
+            c0 = os.times(); t0 = time.perf_counter()
+            for key, cfg in jobs: eng.start(key, cfg)
+            outcome = uploads.wait_settled(eng, timeout)
+            wall = time.perf_counter() - t0; c1 = os.times()
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        eng.activity.close()
+
+        snap = METRICS.snapshot()["metrics"]
+        ok = int(sum(r["value"] for r in snap["uploads_total"] if r["labels"].get("result") == "ok"))
+        gb = ok * size_mb / 1024
+        cpu = (c1.user - c0.user) + (c1.system - c0.system)
+        return {"variant": variant, "outcome": outcome, "rows": rows, "size_mb": size_mb, "chunk_mb": chunk_mb, "uploaded": ok,
+                "wall_s": round(wall, 3), "mb_per_s": round(ok * size_mb / wall, 1) if wall else None,
+                "base_rss_mb": round(base_rss / 1024, 1), "peak_rss_mb": round(peak_rss / 1024, 1),
+                "delta_rss_mb": round((peak_rss - base_rss) / 1024, 1),
+                "peak_anon_mb": round((rss.peak["RssAnon"] - base.peak["RssAnon"]) / 1024, 1) if rss.peak["RssAnon"] else None,
+                "peak_file_mb": round((rss.peak["RssFile"] - base.peak["RssFile"]) / 1024, 1) if rss.peak["RssFile"] else None,
+                "cpu_s": round(cpu, 2), "user_s": round(c1.user - c0.user, 2), "sys_s": round(c1.system - c0.system, 2),
+                "cpu_s_per_gb": round(cpu / gb, 3) if gb else None}
+    finally:
+        os.chdir(REPO); shutil.rmtree(work, ignore_errors=True)
+
+# --- Process cha ---
+def start_server(cert_dir):
+    proc = subprocess.Popen([sys.executable, os.path.join(BENCH, "fake_youtube.py"), "--port", "0", "--cert-dir", cert_dir],
+                            stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line.startswith("Fake YouTube API on "): proc.kill(); raise RuntimeError(f"fake server did not start: {line!r}")
+    return proc, line.split()[4]
+
+def run_variant(variant, args, url, cert):
+    import uploads
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", variant, "--rows", str(args.rows), "--size-mb", str(args.size_mb),
+           "--chunk-mb", str(args.chunk_mb), "--timeout", str(args.timeout), "--url", url]
+    proc = subprocess.run(cmd, env=uploads.repo_env(HTTPLIB2_CA_CERTS=cert, SSL_CERT_FILE=cert), capture_output=True, text=True, timeout=args.timeout + 60)
+    lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+    if proc.returncode or not lines: raise RuntimeError(f"variant {variant} failed ({proc.returncode}):\n{proc.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+def print_table(results):
+    cols = [("variant", 7), ("outcome", 7), ("uploaded", 8), ("wall_s", 8), ("mb_per_s", 8), ("base_rss_mb", 11),
+            ("peak_rss_mb", 11), ("delta_rss_mb", 12), ("peak_anon_mb", 12), ("peak_file_mb", 12), ("user_s", 7), ("sys_s", 7), ("cpu_s_per_gb", 12)]
+    print("  ".join(n[:w].rjust(w) for n, w in cols))
+    for r in results: print("  ".join(str(r.get(n) if r.get(n) is not None else "-")[:w].rjust(w) for n, w in cols))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare client memory and CPU of mediaSource read vs mmap on large uploads.")
+    parser.add_argument("variants", nargs="*", default=VARIANTS, help="mediaSource values to run (default: read mmap)")
+    parser.add_argument("--rows", type=int, default=8, help="Concurrent uploads, one video each (default: %(default)s)")
+    parser.add_argument("--size-mb", type=int, default=512, help="Size of each video in MB (default: %(default)s)")
+    parser.add_argument("--chunk-mb", type=int, default=64, help="Fixed chunk size in MB (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per variant, alternating (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds per run (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object (for tracking over time)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.rows, args.size_mb, args.chunk_mb, args.url, args.timeout)), flush=True); return 0
+
+    unknown = [v for v in args.variants if v not in VARIANTS]
+    if unknown: parser.error(f"unknown variant(s): {', '.join(unknown)}")
+    sys.path.insert(0, BENCH)
+    cert_dir = tempfile.mkdtemp(prefix="ayt-bench-cert-")
+    server, url = start_server(cert_dir)
+    results = []
+    try:
+        for _ in range(args.repeat):
+            for variant in args.variants:
+                results.append(run_variant(variant, args, url, os.path.join(cert_dir, "fake-youtube.pem")))
+                if not args.json: print(f"{variant}: {results[-1]['outcome']} in {results[-1]['wall_s']}s", file=sys.stderr, flush=True)
+    finally:
+        server.terminate(); server.wait()
+        shutil.rmtree(cert_dir, ignore_errors=True)
+    if args.json: print(json.dumps({"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}))
+    else: print_table(results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
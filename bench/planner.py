@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import random
+import argparse
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine import SchedulePlanner
+
+# =============================================================================
+# SCHEDULE PLANNER BENCHMARK
+# =============================================================================
+# Lập lịch cho N video chia đều cho C kênh, mỗi kênh đã có sẵn một số giờ đặt trước
+# (giống ledger sau vài lần chạy), rồi kiểm tra không kênh nào bị trùng giờ.
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan publish times for many channels and check for double-booking.")
+    parser.add_argument("--videos", type=int, default=10000)
+    parser.add_argument("--channels", type=int, default=500)
+    parser.add_argument("--booked", type=int, default=20, help="Already booked slots per channel (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs, best is reported (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(1)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    slot_sets = ["08:00, 19:00", "06:30, 12:00, 18:00, 22:15", "09:00", "07:00, 11:00, 15:00, 19:00, 23:00"]
+    channels = []
+    for c in range(args.channels):
+        booked = [now + datetime.timedelta(hours=rnd.randint(1, 24 * 14), minutes=rnd.choice((0, 30))) for _ in range(args.booked)]
+        channels.append((rnd.choice(slot_sets), rnd.randint(0, 2), rnd.choice(("Asia/Ho_Chi_Minh", "America/Los_Angeles", "UTC")), booked))
+    per = [args.videos // args.channels + (1 if i < args.videos % args.channels else 0) for i in range(args.channels)]
+
+    timings = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        calendars = []
+        for (slots, gap, tz, booked), n in zip(channels, per): calendars.append((booked, SchedulePlanner(slots, gap, tz, booked).plan(n)))
+        timings.append(time.perf_counter() - t0)
+
+    clashes = 0
+    for booked, plan in calendars:
+        taken = {int(b.timestamp()) for b in booked}
+        for dt in plan:
+            if int(dt.timestamp()) in taken or dt <= now: clashes += 1
+            taken.add(int(dt.timestamp()))
+    print(f"Planned {sum(per)} videos on {args.channels} channels in {min(timings) * 1000:.1f} ms (best of {len(timings)}); double-booked or past slots: {clashes}")
+    return 1 if clashes else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
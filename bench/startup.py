@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# =============================================================================
+# STARTUP BENCHMARK
+# =============================================================================
+# Đo thời gian khởi động, tính từ lúc tạo process:
+#   - import engine (chạy không giao diện / CLI)
+#   - main.py: cửa sổ đầu tiên hiện ra (window), grid nạp xong (grid),
+#     Firebase + license xong (license), sẵn sàng (ready).
+# main.py chạy trong thư mục tạm với grid_state.json giả N dòng, biến STARTUP_PROBE
+# làm app in mốc thời gian dạng JSON rồi tự đóng. Cần màn hình (DISPLAY) hoặc xvfb-run.
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def repo_env(**extra):
+    path = os.pathsep.join(p for p in (REPO, os.environ.get("PYTHONPATH")) if p)
+    return dict(os.environ, PYTHONPATH=path, **extra)
+
+def make_workdir(rows):
+    work = tempfile.mkdtemp(prefix="ayt-startup-")
+    grid = {str(i + 1): {"secret": "", "folder": "", "acc": "", "time": "08:00, 19:00", "gap": 0,
+                         "cat": "Default (From Settings)", "chk": True, "playlist_name": "", "playlist_id": ""} for i in range(rows)}
+    with open(os.path.join(work, "grid_state.json"), "w", encoding="utf-8") as f: json.dump(grid, f)
+    return work
+
+def timed_run(cmd, cwd, env=None, timeout=120):
+    # -> {stage: giây kể từ lúc spawn}, đọc từng dòng stdout ngay khi process in ra.
+    t0 = time.perf_counter(); stages = {}
+    proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        for line in proc.stdout:
+            try: ev = json.loads(line)
+            except ValueError: continue
+            if isinstance(ev, dict) and "stage" in ev: stages[ev["stage"]] = time.perf_counter() - t0
+        proc.wait(timeout)
+    finally:
+        if proc.poll() is None: proc.kill()
+    if proc.returncode: raise RuntimeError(f"{' '.join(cmd)} exited with {proc.returncode}")
+    stages["exit"] = time.perf_counter() - t0
+    return stages
+
+def summarize(samples):
+    keys = sorted({k for s in samples for k in s}, key=lambda k: statistics.median(s[k] for s in samples if k in s))
+    return {k: {"median": statistics.median(v), "min": min(v), "max": max(v)} for k in keys for v in [[s[k] for s in samples if k in s]]}
+
+def bench_engine(work, runs):
+    env = repo_env()
+    base = [timed_run([sys.executable, "-c", "pass"], work, env) for _ in range(runs)]
+    imp = [timed_run([sys.executable, "-c", "import engine"], work, env) for _ in range(runs)]
+    return {"python": summarize(base)["exit"], "import engine": summarize(imp)["exit"]}
+
+def bench_gui(work, runs):
+    cmd = [sys.executable, os.path.join(REPO, "main.py")]
+    if not os.environ.get("DISPLAY"):
+        if not shutil.which("xvfb-run"): return None
+        cmd = ["xvfb-run", "-a"] + cmd
+    env = repo_env(STARTUP_PROBE="1")
+    return summarize([timed_run(cmd, work, env) for _ in range(runs)])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure engine import time and GUI time-to-first-window / time-to-ready.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement (default: %(default)s)")
+    parser.add_argument("--rows", type=int, default=300, help="Rows in the synthetic grid (default: %(default)s)")
+    parser.add_argument("--no-gui", action="store_true", help="Only measure the headless import")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object (for tracking over time)")
+    args = parser.parse_args(argv)
+
+    work = make_workdir(args.rows)
+    try:
+        result = {"rows": args.rows, "runs": args.runs, "ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "engine": bench_engine(work, args.runs)}
+        result["gui"] = None if args.no_gui else bench_gui(work, args.runs)
+    finally: shutil.rmtree(work, ignore_errors=True)
+
+    if args.json: print(json.dumps(result)); return 0
+    print(f"Startup ({args.runs} runs, grid {args.rows} rows), seconds since process spawn:")
+    for section in ("engine", "gui"):
+        if result[section] is None: print("  gui: skipped (no DISPLAY and no xvfb-run)"); continue
+        for stage, st in result[section].items():
+            print(f"  {section:6} {stage:14} median {st['median']:7.3f}   min {st['min']:7.3f}   max {st['max']:7.3f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
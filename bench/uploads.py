@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import time
+import shutil
+import zlib
+import struct
+import random
+import argparse
+import datetime
+import tempfile
+import subprocess
+
+# =============================================================================
+# UPLOAD BENCHMARK (OFFLINE)
+# =============================================================================
+# Chạy UploadEngine thật (RowJob, pool, retry, PostUploadQueue, cả 2 transport) với
+# server giả lập bench/fake_youtube.py thay cho YouTube: không đụng kênh thật, không
+# tốn quota thật. Mỗi kịch bản chạy trong một process riêng, thư mục tạm riêng (token,
+# secret, ledger, video giả) để trạng thái toàn cục của engine không lẫn giữa các lần.
+# Kết quả: thông lượng, giây mỗi video, số API call mỗi video, retry, quota.
+# Cần thư viện Google API như khi chạy app (googleapiclient, google-auth, httplib2).
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB = 1024 * 1024
+
+SCENARIOS = {
+    # rows x files, kích thước mỗi video, tham số server giả lập.
+    "small": {"desc": "1 row x 100 small files", "rows": 1, "files": 100, "size": 256 * 1024,
+              "server": {"latency": 0.01}},
+    "large": {"desc": "50 rows x 1 large file", "rows": 50, "files": 1, "size": 32 * MB,
+              "server": {"latency": 0.01, "link_bandwidth": 400 * MB}},
+    "flaky": {"desc": "4 rows x 10 files, 503 bursts + dropped connections + slow link", "rows": 4, "files": 10, "size": 8 * MB,
+              "server": {"latency": 0.05, "jitter": 0.1, "error_rate": 0.05, "burst": 3, "drop_rate": 0.05, "bandwidth": 20 * MB}},
+    "quota": {"desc": "2 rows x 5 files, project quota runs out after 2 videos", "rows": 2, "files": 5, "size": 256 * 1024,
+              "server": {"latency": 0.01, "quota_limit": 2 * 1700 + 1000}},
+    # Quota thật (10.000/ngày) ở cả app lẫn server: 5 dòng upload song song, app phải tự lên lịch
+    # đủ 5 video (5 x 1700) rồi hoãn phần còn lại, không để server trả quotaExceeded.
+    "planned": {"desc": "5 rows x 2 files, 10000-unit project quota planned by the app", "rows": 5, "files": 2, "size": 256 * 1024,
+                "server": {"latency": 0.01, "quota_limit": 10000}, "quota_per_project": 10000},
+    # Giới hạn 160 Mbit/s (20 MB/s) chia theo weight 4:2:1:1 -> dòng 1 xong trước, tổng ~20 MB/s.
+    "shaped": {"desc": "4 rows x 2 files, 160 Mbit/s cap shared 4:2:1:1", "rows": 4, "files": 2, "size": 16 * MB,
+               "server": {"latency": 0.01}, "bandwidth_mbps": 160, "weights": [4, 2, 1, 1]},
+}
+DEFAULT_SCENARIOS = ["small", "large", "flaky", "quota", "planned", "shaped"]
+
+def repo_env(**extra):
+    # PYTHONPATH: repo (engine) + bench/ (fake_youtube); extra: biến môi trường tin chứng chỉ giả.
+    path = os.pathsep.join(p for p in (REPO, os.path.join(REPO, "bench"), os.environ.get("PYTHONPATH")) if p)
+    return dict(os.environ, PYTHONPATH=path, **extra)
+
+# --- Dữ liệu giả ---
+def box(kind, *parts):
+    body = b"".join(parts)
+    return struct.pack(">I4s", 8 + len(body), kind) + body
+
+def write_fake_mp4(f, size, rnd, seconds=60):
+    # MP4 tối thiểu qua được pre-flight: ftyp + moov (mvhd, 1 track hình) + mdat phủ hết phần còn lại.
+    # mdat mở đầu bằng 4 KB ngẫu nhiên, phần sau là lỗ (file thưa).
+    mvhd = box(b"mvhd", struct.pack(">IIIII", 0, 0, 0, 1000, seconds * 1000), bytes(80))
+    trak = box(b"trak", box(b"mdia", box(b"hdlr", struct.pack(">II4s", 0, 0, b"vide"), bytes(13))))
+    head = box(b"ftyp", b"isom", struct.pack(">I", 512), b"isommp41") + box(b"moov", mvhd, trak)
+    f.write(head + struct.pack(">I4s", size - len(head), b"mdat") + rnd.randbytes(4096)); f.truncate(size)
+
+def fake_png(width=1280, height=720, rgb=(40, 40, 40)):
+    # Ảnh PNG một màu, đúng chuẩn thumbnail (16:9, vài KB) -> được gửi nguyên bản.
+    chunk = lambda kind, data: struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    raw = (b"\0" + bytes(rgb) * width) * height
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) + chunk(b"IDAT", zlib.compress(raw, 9)) + chunk(b"IEND", b"")
+
+def make_workdir(sc, seed=1):
+    # -> (workdir, [(row key, job config)]); video là MP4 thưa (sparse) có 4 KB ngẫu nhiên
+    # để mỗi file một fingerprint khác nhau (không bị dedup) mà không tốn đĩa.
+    work = tempfile.mkdtemp(prefix="ayt-bench-")
+    for d in ("client_secrets", "user_tokens", "videos"): os.makedirs(os.path.join(work, d))
+    cid = "bench-client.apps.googleusercontent.com"
+    with open(os.path.join(work, "client_secrets", "bench.json"), "w") as f:
+        json.dump({"installed": {"client_id": cid, "client_secret": "x", "auth_uri": "http://127.0.0.1/auth", "token_uri": "http://127.0.0.1/token"}}, f)
+    expiry = (datetime.datetime.utcnow() + datetime.timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    rnd = random.Random(seed); jobs = []; thumb = fake_png()
+    for r in range(sc["rows"]):
+        acc = f"bench{r:03d}@example.com.json"
+        creds = {"token": f"tok{r}", "refresh_token": "r", "client_id": cid, "client_secret": "x", "token_uri": "http://127.0.0.1/token", "expiry": expiry}
+        with open(os.path.join(work, "user_tokens", acc), "w") as f: json.dump({"google_creds": creds, "client_id": cid, "email": acc[:-5]}, f)
+        root = os.path.join(work, "videos", f"row{r:03d}")
+        for i in range(sc["files"]):
+            folder = os.path.join(root, f"v{i:04d}"); os.makedirs(folder)
+            with open(os.path.join(folder, "video.mp4"), "wb") as f: write_fake_mp4(f, sc["size"], rnd)
+            with open(os.path.join(folder, "thumb.png"), "wb") as f: f.write(thumb)
+            with open(os.path.join(folder, "info.txt"), "w", encoding="utf-8") as f: f.write(f"Title: Bench {r}/{i}\nVideo Description: bench\nTags: bench\n")
+        jobs.append((str(r + 1), {"secret": "bench.json", "folder": root, "acc": acc, "time": "08:00, 12:00, 19:00",
+                                  "cat_name": "Default (From Settings)", "gap": 0, "playlist_id": "PL0000", "tz": "",
+                                  "weight": (sc.get("weights") or [1] * sc["rows"])[r]}))
+    return work, jobs
+
+# --- Chạy trong process con ---
+def wait_settled(eng, timeout):
+    # Xong khi mọi dòng kết thúc; "deferred" khi các dòng còn lại đều đang chờ quota/cooldown lâu.
+    deadline = time.monotonic() + timeout
+    while True:
+        live = [j for j in list(eng.jobs.values()) if not j.finished]
+        idle = eng.pool.stats()['active'] == 0 and not eng.post.pending()
+        if not live and idle: return "done"
+        if live and idle and all(j.not_before > time.monotonic() + 30 for j in live): return "deferred"
+        if time.monotonic() > deadline: return "timeout"
+        time.sleep(0.02)
+
+def run_child(name, transport, workers, backoff_scale, timeout, cert_dir):
+    sc = SCENARIOS[name]
+    work, jobs = make_workdir(sc)
+    os.chdir(work)
+    try:
+        import engine
+        from fake_youtube import FakeYouTube
+        from metrics import METRICS
+        cert = os.path.join(cert_dir, "fake-youtube.pem"); key = os.path.join(cert_dir, "fake-youtube.key")
+        fake = FakeYouTube(seed=1, **sc["server"]).start(certfile=cert, keyfile=key)
+        engine.CURRENT_SETTINGS.update(apiEndpoint=fake.url, transport=transport, maxWorkers=workers, maxPerAccount=1,
+                                       chunkMinMB=1, chunkMaxMB=4, quotaPerProject=sc.get("quota_per_project", 10 ** 9),
+                                       writeDoneJson=False, bandwidthLimitMbps=sc.get("bandwidth_mbps", 0))
+        # Server giả lập sẵn sàng ngay: bỏ độ trễ chờ video "xử lý" của thumbnail/playlist.
+        # Thời gian của retry (backoff, hồi ngân sách retry, cooldown) co theo backoff_scale
+        # để kịch bản lỗi chạy trong vài giây mà tỉ lệ giữa các tham số vẫn như thật.
+        engine.POST_FIRST_DELAY = 0.0; engine.POST_RETRY_MIN = 0.0
+        policy = engine.RETRY_POLICY
+        policy.base_delay *= backoff_scale; policy.max_delay *= backoff_scale; engine.RETRY_COOLDOWN *= backoff_scale
+        policy.global_budget.refill_per_sec /= backoff_scale
+        policy.account_budget_args = (policy.account_budget_args[0], policy.account_budget_args[1] / backoff_scale)
+
+        eng = engine.UploadEngine()
+        row_done = {}
+        eng.subscribe(lambda ev: ev['kind'] == "done" and row_done.setdefault(ev['row'], time.perf_counter()))
+        t0 = time.perf_counter()
+        for key, cfg in jobs: eng.start(key, cfg)
+        outcome = wait_settled(eng, timeout)
+        wall = time.perf_counter() - t0
+        eng.activity.close()
+
+        st = fake.stats(); snap = METRICS.snapshot()["metrics"]
+        total = lambda metric, **match: sum(r.get("value", r.get("count", 0)) for r in snap[metric] if all(r["labels"].get(k) == v for k, v in match.items()))
+        ok = int(total("uploads_total", result="ok"))
+        chunks = [r for r in snap["chunk_seconds"]]
+        chunk_n = sum(r["count"] for r in chunks); chunk_s = sum(r["sum"] for r in chunks)
+        fake.stop()
+        return {"scenario": name, "desc": sc["desc"], "transport": transport, "workers": workers, "outcome": outcome,
+                "videos": sc["rows"] * sc["files"], "uploaded": ok, "server_videos": st["videos"], "wall_s": round(wall, 3),
+                "s_per_video": round(wall / ok, 4) if ok else None,
+                "mb_per_s": round(ok * sc["size"] / MB / wall, 2) if wall else None,
+                "api_calls": st["api_calls"], "api_calls_per_video": round(st["api_calls"] / ok, 2) if ok else None,
+                "calls": st["calls"], "retries": int(total("retries_total")), "giveups": int(total("retry_giveups_total")),
+                "chunk_avg_ms": round(chunk_s / chunk_n * 1000, 1) if chunk_n else None,
+                "quota_units": st["quota_used"],
+                "row_done_s": {k: round(v - t0, 2) for k, v in sorted(row_done.items(), key=lambda kv: int(kv[0]))}}
+    finally:
+        os.chdir(REPO); shutil.rmtree(work, ignore_errors=True)
+
+# --- Process cha ---
+def run_scenario(name, args, cert_dir):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", name, "--transport", args.transport, "--workers", str(args.workers),
+           "--backoff-scale", str(args.backoff_scale), "--timeout", str(args.timeout), "--cert-dir", cert_dir]
+    cert = os.path.join(cert_dir, "fake-youtube.pem")
+    proc = subprocess.run(cmd, env=repo_env(HTTPLIB2_CA_CERTS=cert, SSL_CERT_FILE=cert), capture_output=True, text=True, timeout=args.timeout + 60)
+    lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+    if proc.returncode or not lines: raise RuntimeError(f"scenario {name} failed ({proc.returncode}):\n{proc.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+def print_table(results):
+    cols = [("scenario", 8), ("transport", 9), ("outcome", 8), ("uploaded", 8), ("wall_s", 8), ("s_per_video", 11),
+            ("mb_per_s", 8), ("api_calls_per_video", 13), ("retries", 7), ("chunk_avg_ms", 12)]
+    print("  ".join(n[:w].rjust(w) for n, w in cols))
+    for r in results: print("  ".join(str(r.get(n) if r.get(n) is not None else "-")[:w].rjust(w) for n, w in cols))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline upload benchmark against a local fake YouTube API.")
+    parser.add_argument("scenarios", nargs="*", default=DEFAULT_SCENARIOS, help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--transport", choices=["thread", "async", "both"], default="thread")
+    parser.add_argument("--workers", type=int, default=8, help="maxWorkers for the engine (default: %(default)s)")
+    parser.add_argument("--backoff-scale", type=float, default=0.05, help="Multiply retry backoff delays (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds per scenario (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object (for tracking over time)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--cert-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.transport, args.workers, args.backoff_scale, args.timeout, args.cert_dir)), flush=True); return 0
+
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown: parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    transports = ["thread", "async"] if args.transport == "both" else [args.transport]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from fake_youtube import make_certificate
+    cert_dir = tempfile.mkdtemp(prefix="ayt-bench-cert-"); make_certificate(cert_dir)
+    results = []
+    try:
+        for name in args.scenarios:
+            for transport in transports:
+                args_t = argparse.Namespace(**dict(vars(args), transport=transport))
+                results.append(run_scenario(name, args_t, cert_dir))
+                if not args.json: print(f"{name}/{transport}: {results[-1]['outcome']} in {results[-1]['wall_s']}s", file=sys.stderr, flush=True)
+    finally: shutil.rmtree(cert_dir, ignore_errors=True)
+    if args.json: print(json.dumps({"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}))
+    else: print_table(results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2339 @@
+import os
+import sys
+import datetime
+import json
+import threading
+import time
+import argparse
+import collections
+import queue
+import sqlite3
+import hashlib
+import concurrent.futures
+import zoneinfo
+import random
+import email.utils
+import heapq
+import itertools
+import importlib.util
+import functools
+import mmap
+import atexit
+import pathlib
+import socket
+
+# --- KIỂM TRA & IMPORT GOOGLE API ---
+# Chỉ kiểm tra thư viện có cài chưa; discovery/oauth/httplib2 (nặng, ~1s) được import
+# tại chỗ khi thật sự đăng nhập hoặc upload để app và CLI khởi động nhanh.
+GOOGLE_MODULES = ("google_auth_oauthlib", "google.oauth2", "googleapiclient", "google_auth_httplib2", "httplib2")
+try:
+    if any(importlib.util.find_spec(m) is None for m in GOOGLE_MODULES): raise ImportError(GOOGLE_MODULES)
+    from googleapiclient.errors import HttpError
+except ImportError as e:
+    raise ImportError("Missing Google API libraries!\nPlease run: pip install google-api-python-client google-auth-oauthlib google-auth-httplib2") from e
+
+import metrics
+import preflight
+import thumbnails
+from metrics import METRICS
+
+# =============================================================================
+# SYSTEM CONFIGURATION
+# =============================================================================
+
+SCOPES = [
+    "openid",
+    "https://www.googleapis.com/auth/youtube.upload",
+    "https://www.googleapis.com/auth/youtube.readonly",
+    "https://www.googleapis.com/auth/userinfo.email",
+    "https://www.googleapis.com/auth/youtube"
+]
+
+TOKEN_DIR = "user_tokens"
+SECRET_DIR = "client_secrets"
+SETTINGS_FILE = "settings.json"
+GRID_STATE_FILE = "grid_state.json"
+SCAN_CACHE_FILE = "scan_cache.json"
+LEDGER_FILE = "uploads.db"
+PLAYLIST_CACHE_FILE = "playlist_cache.json"
+THUMB_CACHE_DIR = "thumb_cache"
+LOG_DIR = "logs"
+ACTIVITY_LOG_FILE = os.path.join(LOG_DIR, "activity.jsonl")
+
+for d in [TOKEN_DIR, SECRET_DIR]:
+    if not os.path.exists(d):
+        os.makedirs(d)
+
+SERVICE_REFRESH_MARGIN = 300  # Refresh access token trước khi hết hạn 5 phút.
+
+# =============================================================================
+# DATA
+# =============================================================================
+
+YT_CATEGORIES = {
+    "Default (From Settings)": "default",
+    "Film & Animation": "1",
+    "Autos & Vehicles": "2",
+    "Music": "10",
+    "Pets & Animals": "15",
+    "Sports": "17",
+    "Travel & Events": "19",
+    "Gaming": "20",
+    "People & Blogs": "22",
+    "Comedy": "23",
+    "Entertainment": "24",
+    "News & Politics": "25",
+    "Howto & Style": "26",
+    "Education": "27",
+    "Science & Technology": "28",
+    "Nonprofits & Activism": "29"
+}
+
+YT_LANGUAGES = {
+    "English (Global)": "en",
+    "English (United States)": "en-US",
+    "Vietnamese (Vietnam)": "vi",
+    "Japanese (Japan)": "ja",
+    "Korean (South Korea)": "ko",
+    "Chinese (Simplified)": "zh-CN",
+    "Chinese (Traditional)": "zh-TW",
+    "Spanish (Spain)": "es",
+    "French (France)": "fr",
+    "German (Germany)": "de",
+    "Russian (Russia)": "ru",
+    "Portuguese (Brazil)": "pt-BR",
+    "Indonesian (Indonesia)": "id",
+    "Thai (Thailand)": "th"
+}
+
+YT_LOCATIONS = {
+    "No Location": {"desc": "", "lat": 0.0, "long": 0.0},
+    "United States": {"desc": "United States", "lat": 37.0902, "long": -95.7129},
+    "Vietnam": {"desc": "Vietnam", "lat": 14.0583, "long": 108.2772},
+    "Japan": {"desc": "Japan", "lat": 36.2048, "long": 138.2529},
+    "South Korea": {"desc": "South Korea", "lat": 35.9078, "long": 127.7669},
+    "United Kingdom": {"desc": "United Kingdom", "lat": 55.3781, "long": -3.4360},
+    "Germany": {"desc": "Germany", "lat": 51.1657, "long": 10.4515},
+    "France": {"desc": "France", "lat": 46.2276, "long": 2.2137},
+    "Brazil": {"desc": "Brazil", "lat": -14.2350, "long": -51.9253},
+    "India": {"desc": "India", "lat": 20.5937, "long": 78.9629}
+}
+
+DEFAULT_SETTINGS = {
+    "categoryId": "22",          
+    "languageCode": "en-US",     
+    "locationKey": "United States",
+    "maxWorkers": 4,
+    "maxPerAccount": 1,
+    "maxPerSecret": 0,
+    "chunkMinMB": 1,
+    "chunkMaxMB": 64,
+    "writeDoneJson": True,
+    "duplicatePolicy": "skip",
+    "quotaPerProject": 10000,
+    "quotaOverrides": {},
+    "transport": "thread",
+    "asyncMaxUploads": 256,
+    "metricsPort": 0,
+    "metricsJson": "",
+    "metricsInterval": 30,
+    "apiEndpoint": "",
+    "bandwidthLimitMbps": 0,
+    "mediaSource": "mmap",
+    "preflightWorkers": 2,
+    "maxVideoMinutes": 720,
+    "maxVideoGB": 256
+}
+
+# =============================================================================
+# UTILS
+# =============================================================================
+
+def load_json(filepath, default_val):
+    if not os.path.exists(filepath): return default_val
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except:
+        return default_val
+
+def save_json(filepath, data):
+    try:
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+        return True
+    except:
+        return False
+
+def load_grid_rows(filepath=GRID_STATE_FILE):
+    saved = load_json(filepath, None)
+    if isinstance(saved, list): return [(str(i+1), d) for i, d in enumerate(saved)]
+    if isinstance(saved, dict): return [(k, saved[k]) for k in sorted(saved.keys(), key=lambda x: int(x))]
+    return []
+
+def grid_row_to_job(data):
+    return {
+        'secret': data.get('secret', ''), 'folder': data.get('folder', ''), 'acc': data.get('acc', ''),
+        'time': data.get('time', ''), 'cat_name': data.get('cat', "Default (From Settings)"),
+        'gap': int(data.get('gap') or 0), 'playlist_id': data.get('playlist_id', ''), 'tz': data.get('tz', ''),
+        'weight': float(data.get('weight') or 1)
+    }
+
+CURRENT_SETTINGS = dict(load_json(SETTINGS_FILE, DEFAULT_SETTINGS))
+
+class ActivityLog:
+    # write() chỉ put vào SimpleQueue (không khoá, gọi được từ mọi luồng). Một luồng nền
+    # gom bản ghi theo lô và ghi ra file JSONL xoay vòng (activity.jsonl, .1 ... .N).
+    # Mỗi tap() là một hàng đợi riêng để bên hiển thị (GUI) tự lấy theo nhịp của nó.
+    def __init__(self, path=ACTIVITY_LOG_FILE, max_bytes=5*1024*1024, backups=20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.SimpleQueue()
+        self.taps = []
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def write(self, text, row=None):
+        rec = {"ts": time.time(), "row": row, "text": text}
+        self.queue.put(rec)
+        for q in self.taps: q.put(rec)
+
+    def tap(self):
+        q = queue.SimpleQueue()
+        self.taps.append(q)
+        return q
+
+    def close(self, timeout=2.0):
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src): os.replace(src, f"{self.path}.{i+1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def _writer(self):
+        f = None
+        while True:
+            rec = self.queue.get()
+            batch = [rec]
+            try:
+                while len(batch) < 1000: batch.append(self.queue.get_nowait())
+            except queue.Empty: pass
+            stop = None in batch
+            try:
+                if f is None:
+                    if os.path.dirname(self.path): os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    f = open(self.path, "a", encoding="utf-8")
+                f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch if r is not None))
+                f.flush()
+                if f.tell() >= self.max_bytes:
+                    f.close(); f = None; self._rotate()
+            except Exception as e:
+                print(f"Activity Log Error: {e}")
+                if f: f.close()
+                f = None
+            if stop:
+                if f: f.close()
+                return
+
+# =============================================================================
+# RETRY POLICY
+# =============================================================================
+# Dùng chung cho mọi lời gọi API: backoff luỹ thừa + jitter ngẫu nhiên (các dòng không
+# retry cùng nhịp), tôn trọng Retry-After, và mỗi lần retry phải trả 1 "token" từ ngân sách
+# của tài khoản và ngân sách chung. Khi YouTube lỗi diện rộng, ngân sách cạn -> các dòng
+# dừng retry và chờ thay vì cùng dồn request vào server.
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "backendError", "internalError"}
+NETWORK_ERRORS = {"ServerNotFoundError", "TransportError", "RedirectMissingLocation", "IncompleteRead", "RemoteDisconnected"}
+
+class RetryBudgetExceeded(Exception):
+    pass
+
+class RetryBudget:
+    # Token bucket: tối đa `capacity` lần retry dồn dập, hồi `refill_per_sec` token mỗi giây.
+    def __init__(self, capacity, refill_per_sec):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = float(capacity)
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_spend(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.refill_per_sec)
+            self.stamp = now
+            if self.tokens < 1: return False
+            self.tokens -= 1
+            return True
+
+def http_error_reason(e):
+    try:
+        err = json.loads(e.content.decode("utf-8") if isinstance(e.content, bytes) else e.content).get("error", {})
+        return (err.get("errors") or [{}])[0].get("reason", "") or err.get("status", "")
+    except Exception: return ""
+
+def is_quota_exceeded(e):
+    return isinstance(e, HttpError) and (http_error_reason(e) == "quotaExceeded" or "quotaExceeded" in str(e))
+
+def parse_retry_after(value):
+    if not value: return None
+    try: return max(0.0, float(value))
+    except ValueError: pass
+    try: return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception: return None
+
+class RetryPolicy:
+    def __init__(self, base_delay=1.0, max_delay=120.0, max_attempts=8, global_budget=(60, 1.0), account_budget=(10, 0.2)):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.global_budget = RetryBudget(*global_budget)
+        self.account_budget_args = account_budget
+        self.account_budgets = {}
+        self.lock = threading.Lock()
+
+    def classify(self, e):
+        # -> (retry được không, nguyên nhân, số giây Retry-After hoặc None)
+        if isinstance(e, HttpError):
+            status = e.resp.status; reason = http_error_reason(e)
+            retry_after = parse_retry_after(e.resp.get("retry-after")) if hasattr(e.resp, "get") else None
+            if status in RETRYABLE_STATUS or (status == 403 and reason in RETRYABLE_REASONS):
+                return True, reason or f"http{status}", retry_after
+            return False, reason or f"http{status}", None
+        # Chỉ lỗi mạng mới retry; OSError khác (file mất/không đọc được, chứng chỉ sai) báo lỗi ngay.
+        if isinstance(e, (ConnectionError, TimeoutError, socket.gaierror, socket.timeout)) or type(e).__name__ in NETWORK_ERRORS:
+            return True, type(e).__name__, None
+        return False, type(e).__name__, None
+
+    def delay(self, attempt, retry_after=None):
+        d = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None: d = max(d, min(retry_after, self.max_delay * 5))
+        return d
+
+    def _account_budget(self, account):
+        with self.lock:
+            if account not in self.account_budgets: self.account_budgets[account] = RetryBudget(*self.account_budget_args)
+            return self.account_budgets[account]
+
+    def plan(self, e, attempt, account="", on_retry=None, extra_causes=(), max_attempts=None):
+        # Gọi trong khối except: trả về số giây phải chờ trước lần thử sau, hoặc raise.
+        # extra_causes: lỗi bình thường không retry nhưng nơi gọi coi là tạm thời (vd. video chưa xử lý xong).
+        retryable, cause, retry_after = self.classify(e)
+        retryable = retryable or cause in extra_causes
+        if not retryable or attempt + 1 >= (max_attempts or self.max_attempts): METRICS.inc("retry_giveups_total", cause=cause, account=account); raise e
+        if not self._account_budget(account).try_spend() or not self.global_budget.try_spend():
+            METRICS.inc("retry_giveups_total", cause=cause, account=account)
+            raise RetryBudgetExceeded(f"Retry budget exhausted ({cause})") from e
+        METRICS.inc("retries_total", cause=cause, account=account)
+        d = self.delay(attempt, retry_after)
+        if on_retry: on_retry(attempt + 1, cause, d)
+        return d
+
+    def backoff(self, e, attempt, account="", on_retry=None):
+        time.sleep(self.plan(e, attempt, account, on_retry))
+
+    def call(self, fn, account="", on_retry=None):
+        attempt = 0
+        while True:
+            try: return fn()
+            except Exception as e:
+                self.backoff(e, attempt, account, on_retry)
+                attempt += 1
+
+RETRY_POLICY = RetryPolicy()
+RETRY_COOLDOWN = 60  # Giây một dòng phải chờ khi ngân sách retry đã cạn.
+
+def api_call(request, account="", on_retry=None, project=None, op=None):
+    # op/project: tính quota cho Cloud project (kể cả khi request lỗi, Google vẫn trừ quota).
+    try: return RETRY_POLICY.call(request.execute, account, on_retry)
+    finally:
+        if op and project: QUOTA.charge(project, op)
+
+# =============================================================================
+# BACKEND LOGIC
+# =============================================================================
+
+def get_client_id_from_file(secret_filename):
+    path = os.path.join(SECRET_DIR, secret_filename)
+    if not os.path.exists(path): return None
+    try:
+        with open(path, 'r') as f:
+            d = json.load(f)
+            return d.get('installed', {}).get('client_id') or d.get('web', {}).get('client_id')
+    except: return None
+
+def get_client_id_from_token(token_path):
+    try:
+        with open(token_path, 'r') as f: return json.load(f).get("client_id")
+    except: return None
+
+class AccountIndex:
+    # Chỉ mục secret -> client_id -> tài khoản (file token), nạp một lần rồi cập nhật dần:
+    # refresh() chỉ stat 2 thư mục; thư mục đổi mtime thì scandir và chỉ đọc lại file đổi mtime.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.dir_mtimes = {}
+        self.secret_cids = {}   # tên file secret -> (mtime_ns, client_id)
+        self.token_cids = {}    # tên file token  -> (mtime_ns, client_id)
+        self.by_cid = {}        # client_id -> [tên file token]
+
+    def _scan(self, directory, entries, reader, force):
+        try: dir_mtime = os.stat(directory).st_mtime_ns
+        except OSError: return False
+        if not force and self.dir_mtimes.get(directory) == dir_mtime: return False
+        fresh = {}
+        for e in os.scandir(directory):
+            if not e.name.endswith(".json") or not e.is_file(): continue
+            mtime = e.stat().st_mtime_ns
+            old = entries.get(e.name)
+            fresh[e.name] = old if old and old[0] == mtime else (mtime, reader(e.path))
+        entries.clear(); entries.update(fresh)
+        self.dir_mtimes[directory] = dir_mtime
+        return True
+
+    def refresh(self, force=False):
+        with self.lock:
+            self._scan(SECRET_DIR, self.secret_cids, lambda p: get_client_id_from_file(os.path.basename(p)), force)
+            if self._scan(TOKEN_DIR, self.token_cids, get_client_id_from_token, force) or force:
+                by_cid = {}
+                for name in sorted(self.token_cids):
+                    cid = self.token_cids[name][1]
+                    if cid: by_cid.setdefault(cid, []).append(name)
+                self.by_cid = by_cid
+
+    def secrets(self):
+        return sorted(self.secret_cids)
+
+    def accounts(self):
+        return sorted(self.token_cids)
+
+    def client_id(self, secret_filename):
+        entry = self.secret_cids.get(secret_filename)
+        return entry[1] if entry else None
+
+    def accounts_for_secret(self, secret_filename):
+        cid = self.client_id(secret_filename)
+        return list(self.by_cid.get(cid, [])) if cid else []
+
+ACCOUNT_INDEX = AccountIndex()
+
+class ServiceCache:
+    # Cache client youtube v3 theo (token, secret). Token chỉ được đọc lại khi file đổi
+    # (so mtime), được refresh trước khi hết hạn SERVICE_REFRESH_MARGIN giây, và mỗi token
+    # có lock riêng nên các tài khoản khác nhau không chờ nhau.
+    # Mỗi request dùng một Http mới (requestBuilder) vì httplib2.Http không an toàn đa luồng,
+    # nhờ vậy một client có thể dùng chung giữa GUI và các worker.
+    def __init__(self, refresh_margin=SERVICE_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self.entries = {}
+        self.token_locks = {}
+        self.lock = threading.Lock()
+
+    def _token_lock(self, token_filename):
+        with self.lock:
+            if token_filename not in self.token_locks: self.token_locks[token_filename] = threading.Lock()
+            return self.token_locks[token_filename]
+
+    def _needs_refresh(self, creds):
+        if not creds.expiry: return not creds.valid
+        return creds.expiry - datetime.datetime.utcnow() < datetime.timedelta(seconds=self.refresh_margin)
+
+    def _refresh(self, token_filename, token_path, store, creds):
+        from google.auth.transport.requests import Request
+        RETRY_POLICY.call(lambda: creds.refresh(Request()), token_filename)
+        store["google_creds"] = json.loads(creds.to_json())
+        with open(token_path + ".tmp", "w") as f: json.dump(store, f, indent=4)
+        os.replace(token_path + ".tmp", token_path)
+        return os.stat(token_path).st_mtime
+
+    def get(self, token_filename, secret_filename):
+        token_path = os.path.join(TOKEN_DIR, token_filename)
+        secret_path = os.path.join(SECRET_DIR, secret_filename)
+        key = (token_filename, secret_filename)
+        with self._token_lock(token_filename):
+            try: token_mtime = os.stat(token_path).st_mtime; secret_mtime = os.stat(secret_path).st_mtime
+            except OSError: self.entries.pop(key, None); return None
+
+            entry = self.entries.get(key)
+            if entry and entry['token_mtime'] == token_mtime and entry['secret_mtime'] == secret_mtime:
+                if self._needs_refresh(entry['creds']):
+                    if not entry['creds'].refresh_token: self.entries.pop(key, None); return None
+                    try: entry['token_mtime'] = self._refresh(token_filename, token_path, entry['store'], entry['creds'])
+                    except Exception: self.entries.pop(key, None); return None
+                return entry['service']
+
+            try:
+                from google.oauth2.credentials import Credentials
+                from googleapiclient.discovery import build
+                from googleapiclient.http import HttpRequest
+                with open(token_path, 'r') as f: store = json.load(f)
+                if "google_creds" not in store or "client_id" not in store: return None
+                target_cid = get_client_id_from_file(secret_filename)
+                if target_cid != store["client_id"]: return None
+
+                creds = Credentials.from_authorized_user_info(store["google_creds"], SCOPES)
+                if self._needs_refresh(creds):
+                    if not creds.refresh_token: return None
+                    token_mtime = self._refresh(token_filename, token_path, store, creds)
+
+                def build_request(http, *args, **kwargs):
+                    return HttpRequest(authorized_http(creds), *args, **kwargs)
+                endpoint = CURRENT_SETTINGS.get("apiEndpoint")  # Rỗng = Google; bench/ trỏ về server giả lập.
+                service = build("youtube", "v3", credentials=creds, requestBuilder=build_request, cache_discovery=False,
+                                client_options={"api_endpoint": endpoint} if endpoint else None)
+            except Exception as e: print(f"Cannot build YouTube client for {token_filename}: {e}"); return None
+            self.entries[key] = {'service': service, 'creds': creds, 'store': store, 'token_mtime': token_mtime, 'secret_mtime': secret_mtime}
+            return service
+
+    def credentials(self, token_filename, secret_filename):
+        # Credentials đã refresh, cho transport tự gửi request (async_upload).
+        if self.get(token_filename, secret_filename) is None: return None
+        with self.lock: entry = self.entries.get((token_filename, secret_filename))
+        return entry['creds'] if entry else None
+
+def authorized_http(creds):
+    # build_http() thay vì httplib2.Http(): có timeout và KHÔNG coi 308 là redirect
+    # (308 = "Resume Incomplete" của upload resumable; Http thường sẽ đi theo/ném RedirectMissingLocation).
+    import google_auth_httplib2
+    from googleapiclient.http import build_http
+    return google_auth_httplib2.AuthorizedHttp(creds, http=build_http())
+
+SERVICE_CACHE = ServiceCache()
+
+def get_authenticated_service(token_filename, secret_filename):
+    return SERVICE_CACHE.get(token_filename, secret_filename)
+
+def create_new_login(secret_filename):
+    secret_path = os.path.join(SECRET_DIR, secret_filename)
+    cid = get_client_id_from_file(secret_filename)
+    if not cid: return None, "Invalid Secret File!"
+
+    try:
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from googleapiclient.discovery import build
+        flow = InstalledAppFlow.from_client_secrets_file(secret_path, SCOPES)
+        creds = flow.run_local_server(port=0, authorization_prompt_message="", timeout_seconds=60)
+        with build("oauth2", "v2", credentials=creds) as oauth_service:
+            email = oauth_service.userinfo().get().execute().get('email')
+        if not email: return None, "Cannot retrieve Email!"
+
+        fname = f"{email}.json"
+        data = {"google_creds": json.loads(creds.to_json()), "client_id": cid, "email": email, "created_at": str(datetime.datetime.now())}
+        with open(os.path.join(TOKEN_DIR, fname), "w") as f: json.dump(data, f, indent=4)
+        return fname, None
+    except Exception as e: return None, f"Error/Timeout: {str(e)}"
+
+def playlists_list_request(youtube, page_token=None, etag=None):
+    request = youtube.playlists().list(
+        part="snippet",
+        mine=True,
+        maxResults=50,
+        pageToken=page_token
+    )
+    if etag: request.headers['If-None-Match'] = etag
+    return request
+
+def fetch_playlists(youtube, account="", project=None, etag=None):
+    # -> (playlists {title: id}, etag trang đầu). Trả về (None, etag) nếu server báo 304 (không đổi).
+    playlists = {}; first_etag = None; token = None
+    while True:
+        try: response = api_call(playlists_list_request(youtube, token, etag if token is None else None), account, project=project, op="playlists.list")
+        except HttpError as e:
+            if e.resp.status == 304: return None, etag
+            raise
+        if token is None: first_etag = response.get("etag")
+        for item in response.get("items", []):
+            playlists[item["snippet"]["title"]] = item["id"]
+        token = response.get("nextPageToken")
+        if not token: return playlists, first_etag
+
+class PlaylistCatalog:
+    # Cache playlist theo tài khoản (playlist_cache.json). Trong TTL thì không gọi API (cũng không
+    # cần đăng nhập); hết hạn thì hỏi lại bằng ETag, server trả 304 nếu danh sách không đổi.
+    # Grid dùng refresh(): trả bản cache (kể cả đã hết hạn) ngay, mỗi tài khoản chỉ một luồng nền
+    # hỏi lại server, mọi dòng cùng tài khoản chờ chung kết quả đó.
+    def __init__(self, path=PLAYLIST_CACHE_FILE, ttl=6 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.account_locks = collections.defaultdict(threading.Lock)
+        self.save_lock = threading.Lock()
+        self.refreshing = {}  # account -> [callback] của các dòng đang chờ lần hỏi lại đang chạy.
+        self.entries = load_json(path, {})
+        if not isinstance(self.entries, dict): self.entries = {}
+
+    def cached(self, account, max_age=None):
+        # Danh sách còn hạn hoặc None; max_age=float('inf') lấy cả bản đã hết hạn.
+        with self.lock: entry = self.entries.get(account)
+        if not entry: return None
+        if time.time() - entry.get("fetched", 0) > (self.ttl if max_age is None else max_age): return None
+        return dict(entry["playlists"])
+
+    def get(self, account, secret, force=False):
+        # force=True: bỏ qua TTL nhưng vẫn là request có điều kiện (ETag).
+        with self.account_locks[account]:
+            if not force:
+                hit = self.cached(account)
+                if hit is not None: return hit
+            stale = self.cached(account, float('inf'))
+            youtube = get_authenticated_service(account, secret)
+            if not youtube: return stale
+            with self.lock: etag = (self.entries.get(account) or {}).get("etag")
+            try: playlists, etag = fetch_playlists(youtube, account, get_client_id_from_file(secret) or secret, etag if stale is not None else None)
+            except Exception as e:
+                print(f"Error fetching playlists: {e}")
+                return stale
+            if playlists is None: playlists = stale
+            with self.lock: self.entries[account] = {"etag": etag, "fetched": time.time(), "playlists": playlists}
+            self.save()
+            return dict(playlists)
+
+    def refresh(self, account, secret, force=False, callback=None):
+        # -> bản cache hiện có (None nếu chưa có). Cache hết hạn (hoặc force) thì hỏi lại ở nền,
+        # xong gọi callback(playlists hoặc None) từ luồng nền.
+        cached = self.cached(account, float('inf'))
+        if cached is not None and not force and self.cached(account) is not None: return cached
+        with self.lock:
+            waiting = self.refreshing.get(account)
+            if waiting is not None:
+                if callback: waiting.append(callback)
+                return cached
+            self.refreshing[account] = [callback] if callback else []
+        def task():
+            try: playlists = self.get(account, secret, force)
+            except Exception as e: print(f"Error fetching playlists: {e}"); playlists = None
+            with self.lock: callbacks = self.refreshing.pop(account, [])
+            for cb in callbacks: cb(playlists)
+        threading.Thread(target=task, name=f"playlists-{account}", daemon=True).start()
+        return cached
+
+    def forget(self, account):
+        with self.lock: self.entries.pop(account, None)
+        self.save()
+
+    def save(self):
+        with self.lock: data = json.dumps(self.entries, ensure_ascii=False)
+        with self.save_lock:
+            try:
+                with open(self.path + ".tmp", "w", encoding="utf-8") as f: f.write(data)
+                os.replace(self.path + ".tmp", self.path)
+            except OSError as e: print(f"Cannot save playlist cache: {e}")
+
+PLAYLIST_CATALOG = PlaylistCatalog()
+
+def playlist_item_request(youtube, video_id, playlist_id):
+    body_request = {
+        "snippet": {
+            "playlistId": str(playlist_id),
+            "resourceId": {
+                "kind": "youtube#video",
+                "videoId": str(video_id)
+            }
+        }
+    }
+    return youtube.playlistItems().insert(
+        part="snippet",
+        body=body_request
+    )
+
+VIDEO_EXTS = (".mp4", ".mp3")
+IMAGE_EXTS = (".jpg", ".png")
+
+def classify_folder(folder_path):
+    # Một lần scandir thay cho 6 lần glob: video, ảnh, file txt, thư mục con, có done.json không.
+    found = {ext: [] for ext in VIDEO_EXTS + IMAGE_EXTS + (".txt",)}
+    subdirs = []; done = False
+    with os.scandir(folder_path) as it:
+        for e in it:
+            if e.is_dir(): subdirs.append(e.name); continue
+            if e.name == "done.json": done = True; continue
+            ext = os.path.splitext(e.name)[1].lower()
+            if ext in found: found[ext].append(e.name)
+    pick = lambda exts: [n for ext in exts for n in sorted(found[ext])]
+    return {"videos": pick(VIDEO_EXTS), "images": pick(IMAGE_EXTS), "texts": sorted(found[".txt"]), "subdirs": sorted(subdirs), "done": done}
+
+def parse_info_file(info_path, title):
+    tags = []; desc = ""
+    
+    if info_path and os.path.exists(info_path):
+        try:
+            with open(info_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+            
+            current_mode = None
+            raw_title, raw_desc, raw_tags = [], [], []
+            
+            for line in lines:
+                clean = line.strip()
+                
+                # --- PHÁT HIỆN TỪ KHÓA (Hỗ trợ cả Tiếng Anh và Tiếng Việt cũ) ---
+                if "Title:" in line or "Tiêu đề:" in line:
+                    current_mode = "title"
+                    # Lấy nội dung sau dấu :
+                    parts = line.split(":", 1)
+                    if len(parts) > 1 and parts[1].strip():
+                        raw_title.append(parts[1].strip())
+                    continue
+
+                if "Video Description:" in line or "Giới thiệu:" in line:
+                    current_mode = "desc"
+                    parts = line.split(":", 1)
+                    if len(parts) > 1 and parts[1].strip():
+                        raw_desc.append(parts[1].strip())
+                    continue
+
+                if "Tags:" in line or "Thẻ tag video:" in line:
+                    current_mode = "tags"
+                    parts = line.split(":", 1)
+                    if len(parts) > 1 and parts[1].strip():
+                        raw_tags.append(parts[1].strip())
+                    continue
+                
+                # --- NẠP DỮ LIỆU ---
+                if current_mode == "title":
+                    if clean: raw_title.append(clean)
+                elif current_mode == "desc":
+                    raw_desc.append(line.rstrip())
+                elif current_mode == "tags":
+                    if clean: raw_tags.append(clean)
+            
+            # --- XỬ LÝ KẾT QUẢ ---
+            if raw_title: title = " ".join(raw_title).strip()
+            if raw_desc: desc = "\n".join(raw_desc).strip()
+            if raw_tags: 
+                # Nối tất cả dòng tag lại, thay xuống dòng bằng dấu phẩy
+                combined = ",".join(raw_tags)
+                # Tách bằng dấu phẩy và xóa khoảng trắng
+                tags = [t.strip() for t in combined.split(",") if t.strip()]
+
+        except Exception as e:
+            print(f"Error parsing text file {info_path}: {e}")
+            
+    return title, tags, desc
+
+class FolderScanner:
+    # Manifest lưu trên đĩa (scan_cache.json): mỗi thư mục ghi mtime thư mục + mtime file txt.
+    # Lần quét sau chỉ stat để so, thư mục nào đổi mới scandir/parse lại. iter_pending()
+    # là generator: upload bắt đầu ngay khi gặp thư mục chờ đầu tiên, phần còn lại quét dần.
+    def __init__(self, path=SCAN_CACHE_FILE, save_interval=30.0):
+        self.path = path
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        self.entries = load_json(path, {})
+        if not isinstance(self.entries, dict): self.entries = {}
+        self.dirty = False
+        self.last_save = time.monotonic()
+        self.save_lock = threading.Lock()
+
+    def _fresh(self, folder, entry):
+        try:
+            if os.stat(folder).st_mtime_ns != entry["mtime"]: return False
+            if entry["info"] and os.stat(os.path.join(folder, entry["info"][0])).st_mtime_ns != entry["info"][1]: return False
+        except OSError: return False
+        return True
+
+    def folder_entry(self, folder):
+        folder = os.path.abspath(folder)
+        with self.lock: entry = self.entries.get(folder)
+        if entry and self._fresh(folder, entry): return entry
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+            found = classify_folder(folder)
+        except OSError:
+            with self.lock:
+                if self.entries.pop(folder, None) is not None: self.dirty = True
+            return None
+        entry = {"mtime": mtime, "info": None, "done": found["done"], "subdirs": found["subdirs"], "video": None}
+        if found["videos"]:
+            info = found["texts"][0] if found["texts"] else None
+            if info: entry["info"] = [info, os.stat(os.path.join(folder, info)).st_mtime_ns]
+            title, tags, desc = parse_info_file(os.path.join(folder, info) if info else None, os.path.splitext(found["videos"][0])[0])
+            entry["video"] = {"video": found["videos"][0], "thumb": found["images"][0] if found["images"] else None, "title": title, "tags": tags, "desc": desc}
+        with self.lock:
+            self.entries[folder] = entry; self.dirty = True
+        return entry
+
+    def folders(self, root):
+        entry = self.folder_entry(root)
+        if not entry: return []
+        if entry["video"]: return [root]
+        return [os.path.join(root, n) for n in entry["subdirs"]]
+
+    def video_data(self, folder, entry):
+        v = entry["video"]
+        return {"folder": folder, "video": os.path.join(folder, v["video"]), "thumb": os.path.join(folder, v["thumb"]) if v["thumb"] else None,
+                "title": v["title"], "tags": list(v["tags"]), "desc": v["desc"]}
+
+    def iter_pending(self, folders, is_done=None):
+        # is_done(folder, entry) -> True nếu đã đăng; mặc định dựa vào done.json.
+        is_done = is_done or (lambda folder, entry: entry["done"])
+        try:
+            for folder in folders:
+                entry = self.folder_entry(folder)
+                if entry and entry["video"] and not is_done(folder, entry): yield self.video_data(folder, entry)
+                self.save()
+        finally: self.save(force=True)
+
+    def save(self, force=False):
+        with self.lock:
+            if not self.dirty or (not force and time.monotonic() - self.last_save < self.save_interval): return
+            data = json.dumps(self.entries, ensure_ascii=False)
+            self.dirty = False; self.last_save = time.monotonic()
+        with self.save_lock:
+            try:
+                with open(self.path + ".tmp", "w", encoding="utf-8") as f: f.write(data)
+                os.replace(self.path + ".tmp", self.path)
+            except OSError as e: print(f"Cannot save scan cache: {e}")
+
+FOLDER_SCANNER = FolderScanner()
+
+# =============================================================================
+# UPLOAD LEDGER (SQLITE)
+# =============================================================================
+# Mọi lần upload (kể cả lỗi) ghi vào một file SQLite có index: thư mục nào đã đăng,
+# video ID, giờ đăng, tài khoản, số byte, kết quả. done.json chỉ còn là bản xuất tương thích;
+# thư mục cũ có done.json nhưng chưa có trong ledger được nhập vào với outcome "imported".
+
+DONE_OUTCOMES = ("scheduled", "imported", "duplicate")
+
+def folder_key(folder):
+    return os.path.normcase(os.path.abspath(folder))
+
+def folders_overlap(a, b):
+    # Cùng thư mục hoặc thư mục này nằm trong thư mục kia -> 2 dòng sẽ quét trúng cùng video.
+    a, b = folder_key(a), folder_key(b)
+    try: return os.path.commonpath([a, b]) in (a, b)
+    except ValueError: return False  # Khác ổ đĩa (Windows).
+
+class UploadLedger:
+    # readonly=True (--plan): chỉ đọc, mọi lệnh ghi (nhập done.json, cache fingerprint/pre-flight,
+    # quota...) bị bỏ qua; chưa có file ledger thì dùng một ledger rỗng trong bộ nhớ.
+    def __init__(self, path=LEDGER_FILE, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        if readonly and os.path.exists(path):
+            self.conn = sqlite3.connect(f"{pathlib.Path(os.path.abspath(path)).as_uri()}?mode=ro", uri=True, check_same_thread=False, isolation_level=None)
+            self.conn.row_factory = sqlite3.Row
+            return
+        self.conn = sqlite3.connect(":memory:" if readonly else path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS uploads (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    folder TEXT NOT NULL,
+                    video_path TEXT,
+                    account TEXT,
+                    secret TEXT,
+                    video_id TEXT,
+                    publish_time TEXT,
+                    bytes INTEGER,
+                    outcome TEXT NOT NULL,
+                    error TEXT,
+                    started_at REAL,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_uploads_folder ON uploads(folder, outcome);
+                CREATE INDEX IF NOT EXISTS idx_uploads_account ON uploads(account, publish_time);
+                CREATE INDEX IF NOT EXISTS idx_uploads_video ON uploads(video_id);
+                CREATE TABLE IF NOT EXISTS quota_usage (
+                    project TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    units INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (project, day)
+                );
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    hash TEXT
+                );
+                CREATE TABLE IF NOT EXISTS preflight (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    result TEXT
+                );
+            """)
+            cols = {r[1] for r in self.conn.execute("PRAGMA table_info(uploads)")}
+            if "content_hash" not in cols: self.conn.execute("ALTER TABLE uploads ADD COLUMN content_hash TEXT")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_hash ON uploads(content_hash, outcome)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_account_time ON uploads(account, publish_time)")
+
+    def _execute(self, sql, args=()):
+        with self.lock: return self.conn.execute(sql, args)
+
+    def _write(self, sql, args=()):
+        if self.readonly: return None
+        return self._execute(sql, args)
+
+    def begin(self, folder, video_path, account, secret, publish_time, nbytes, content_hash=None):
+        cur = self._write(
+            "INSERT INTO uploads (folder, video_path, account, secret, publish_time, bytes, outcome, started_at, content_hash) VALUES (?, ?, ?, ?, ?, ?, 'started', ?, ?)",
+            (folder_key(folder), video_path, account, secret, utc_iso(publish_time), nbytes, time.time(), content_hash))
+        return cur.lastrowid if cur else None
+
+    def record_duplicate(self, folder, video_path, account, content_hash, original):
+        self._write(
+            "INSERT INTO uploads (folder, video_path, account, video_id, bytes, outcome, error, started_at, finished_at, content_hash) VALUES (?, ?, ?, ?, 0, 'duplicate', ?, ?, ?, ?)",
+            (folder_key(folder), video_path, account, original.get('video_id'), f"Same content as {original.get('folder')}", time.time(), time.time(), content_hash))
+
+    def find_uploaded(self, content_hash, exclude_folder=None):
+        row = self._execute("SELECT * FROM uploads WHERE content_hash = ? AND outcome = 'scheduled' AND folder != ? LIMIT 1",
+                            (content_hash, folder_key(exclude_folder) if exclude_folder else "")).fetchone()
+        return dict(row) if row else None
+
+    def quota_used(self, project, day):
+        row = self._execute("SELECT units FROM quota_usage WHERE project = ? AND day = ?", (project, day)).fetchone()
+        return row[0] if row else 0
+
+    def add_quota(self, project, day, units):
+        self._write("INSERT INTO quota_usage (project, day, units) VALUES (?, ?, ?) ON CONFLICT(project, day) DO UPDATE SET units = units + excluded.units",
+                      (project, day, units))
+
+    def set_quota(self, project, day, units):
+        self._write("INSERT INTO quota_usage (project, day, units) VALUES (?, ?, ?) ON CONFLICT(project, day) DO UPDATE SET units = MAX(units, excluded.units)",
+                      (project, day, units))
+
+    def quota_report(self, day):
+        return [dict(r) for r in self._execute("SELECT project, units FROM quota_usage WHERE day = ? ORDER BY project", (day,)).fetchall()]
+
+    def cached_fingerprint(self, path, size, mtime_ns):
+        row = self._execute("SELECT hash FROM fingerprints WHERE path = ? AND size = ? AND mtime_ns = ?", (path, size, mtime_ns)).fetchone()
+        return row[0] if row else None
+
+    def store_fingerprint(self, path, size, mtime_ns, digest):
+        self._write("INSERT OR REPLACE INTO fingerprints (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)", (path, size, mtime_ns, digest))
+
+    def cached_preflight(self, path, size, mtime_ns):
+        row = self._execute("SELECT result FROM preflight WHERE path = ? AND size = ? AND mtime_ns = ?", (path, size, mtime_ns)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def store_preflight(self, path, size, mtime_ns, info):
+        self._write("INSERT OR REPLACE INTO preflight (path, size, mtime_ns, result) VALUES (?, ?, ?, ?)", (path, size, mtime_ns, json.dumps(info)))
+
+    def finish(self, attempt_id, outcome, video_id=None, error=None):
+        self._write("UPDATE uploads SET outcome = ?, video_id = ?, error = ?, finished_at = ? WHERE id = ?",
+                      (outcome, video_id, error, time.time(), attempt_id))
+
+    def is_done(self, folder):
+        return self._execute("SELECT 1 FROM uploads WHERE folder = ? AND outcome IN (%s) LIMIT 1" % ",".join("?" * len(DONE_OUTCOMES)),
+                             (folder_key(folder),) + DONE_OUTCOMES).fetchone() is not None
+
+    def import_done_json(self, folder):
+        data = load_json(os.path.join(folder, "done.json"), {})
+        if not isinstance(data, dict): data = {}
+        publish_time = data.get("publish_time")
+        try: publish_time = utc_iso(datetime.datetime.fromisoformat(publish_time)) if publish_time else None
+        except ValueError: publish_time = None
+        self._write(
+            "INSERT INTO uploads (folder, account, video_id, publish_time, outcome, started_at, finished_at) VALUES (?, ?, ?, ?, 'imported', ?, ?)",
+            (folder_key(folder), data.get("account"), data.get("video_id"), publish_time, time.time(), time.time()))
+
+    def forget(self, folder):
+        # Cho phép đăng lại thư mục: các lần đăng cũ chuyển sang outcome "reset".
+        cur = self._write("UPDATE uploads SET outcome = 'reset' WHERE folder = ? AND outcome IN (%s)" % ",".join("?" * len(DONE_OUTCOMES)),
+                          (folder_key(folder),) + DONE_OUTCOMES)
+        return cur.rowcount if cur else 0
+
+    def is_done_or_import(self, folder, entry):
+        if self.is_done(folder): return True
+        if entry.get("done"): self.import_done_json(folder); return True
+        return False
+
+    def history(self, account=None, since=None, until=None, outcomes=DONE_OUTCOMES):
+        sql = "SELECT * FROM uploads WHERE outcome IN (%s)" % ",".join("?" * len(outcomes)); args = list(outcomes)
+        if account: sql += " AND account = ?"; args.append(account)
+        if since: sql += " AND publish_time >= ?"; args.append(utc_iso(since))
+        if until: sql += " AND publish_time < ?"; args.append(utc_iso(until))
+        return [dict(r) for r in self._execute(sql + " ORDER BY publish_time", args).fetchall()]
+
+    def booked_times(self, account=None, since=None):
+        # -> {account: [publish_time]} của các video đã lên lịch từ `since` (mặc định: bây giờ).
+        since = since or datetime.datetime.now(datetime.timezone.utc)
+        sql = "SELECT account, publish_time FROM uploads WHERE outcome IN ('scheduled', 'imported') AND publish_time >= ?"; args = [utc_iso(since)]
+        if account: sql += " AND account = ?"; args.append(account)
+        booked = collections.defaultdict(list)
+        for acc, pt in self._execute(sql, args).fetchall():
+            try: booked[acc].append(datetime.datetime.strptime(pt, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=datetime.timezone.utc))
+            except (TypeError, ValueError): pass
+        return booked
+
+    def summary(self, since=None):
+        sql = "SELECT account, outcome, COUNT(*) AS n, COALESCE(SUM(bytes), 0) AS bytes FROM uploads"; args = []
+        if since: sql += " WHERE started_at >= ?"; args.append(since.timestamp())
+        return [dict(r) for r in self._execute(sql + " GROUP BY account, outcome ORDER BY account, outcome", args).fetchall()]
+
+def utc_iso(dt):
+    if dt.tzinfo is None: dt = dt.astimezone()
+    return dt.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+def get_ledger(readonly=False):
+    # readonly chỉ có tác dụng ở lần mở đầu tiên (--plan gọi trước mọi thứ khác).
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None: _ledger = UploadLedger(readonly=readonly)
+        return _ledger
+
+# =============================================================================
+# CONTENT FINGERPRINT (DEDUP)
+# =============================================================================
+# Băm nội dung video (BLAKE2b, đọc từng khối 8 MB vào một buffer dùng lại) trên pool luồng
+# riêng, đi trước vài video so với upload. Kết quả cache theo (path, size, mtime) trong
+# ledger nên file nhiều GB không đổi sẽ không bao giờ bị băm lại.
+
+HASH_BLOCK = 8 * 1024 * 1024
+
+def hash_file(path):
+    h = hashlib.blake2b(digest_size=20)
+    buf = bytearray(HASH_BLOCK); mv = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n: break
+            h.update(mv[:n])
+    return h.hexdigest()
+
+class Fingerprinter:
+    def __init__(self, workers=2):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fingerprint")
+
+    def fingerprint(self, path):
+        st = os.stat(path)
+        ledger = get_ledger()
+        digest = ledger.cached_fingerprint(path, st.st_size, st.st_mtime_ns)
+        if digest: return digest
+        digest = hash_file(path)
+        ledger.store_fingerprint(path, st.st_size, st.st_mtime_ns, digest)
+        return digest
+
+    def submit(self, path):
+        return self.executor.submit(self.fingerprint, path)
+
+    def stage(self, items, lookahead=2):
+        # Bọc generator danh sách chờ: trả về (video_data, future băm), luôn băm trước `lookahead` video.
+        buf = collections.deque()
+        for item in items:
+            buf.append((item, self.submit(item['video'])))
+            if len(buf) > lookahead: yield buf.popleft()
+        while buf: yield buf.popleft()
+
+class DedupRegistry:
+    # Video nào đang nằm trong hàng đợi của lần chạy này (hash -> (dòng, thư mục) giữ quyền upload).
+    # Khoá theo cả dòng: 2 dòng cùng quét tới một thư mục thì chỉ dòng đầu được upload.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.owners = {}
+
+    def claim(self, digest, row_id, folder):
+        key = (row_id, folder_key(folder))
+        with self.lock: return self.owners.setdefault(digest, key)
+
+    def release(self, digest, row_id, folder):
+        with self.lock:
+            if self.owners.get(digest) == (row_id, folder_key(folder)): del self.owners[digest]
+
+FINGERPRINTER = Fingerprinter()
+DEDUP_REGISTRY = DedupRegistry()
+
+# =============================================================================
+# PRE-FLIGHT CHECK
+# =============================================================================
+# Trước khi băm và upload, mỗi video chờ được kiểm tra bởi preflight.probe trên một pool
+# process (đọc/parse header không giữ GIL của luồng upload), đi trước PREFLIGHT_LOOKAHEAD
+# video. Kết quả cache trong ledger theo (path, size, mtime) như fingerprint. Video hỏng
+# (cụt, thiếu moov, chỉ có tiếng, quá dài/quá lớn) bị loại khỏi hàng đợi kèm lý do; sửa
+# hoặc thay file (mtime đổi) thì lần quét sau kiểm tra lại. preflightWorkers = 0: chạy
+# trong luồng, không mở process. Pool này dùng chung cho bước chuẩn bị thumbnail.
+
+PREFLIGHT_LOOKAHEAD = 8
+
+class Preflight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.threads = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="preflight")
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                workers = int(CURRENT_SETTINGS.get("preflightWorkers", DEFAULT_SETTINGS["preflightWorkers"]) or 0)
+                try: self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers) if workers > 0 else self.threads
+                except (OSError, NotImplementedError, ValueError): self.executor = self.threads
+            return self.executor
+
+    def run(self, fn, *args):
+        try: return self._executor().submit(fn, *args)
+        except (RuntimeError, concurrent.futures.BrokenExecutor):
+            # Pool process hỏng (process con bị kill...) -> từ giờ chạy trong luồng.
+            with self.lock: self.executor = self.threads
+            return self.threads.submit(fn, *args)
+
+    def submit(self, path):
+        # -> Future[info]; trúng cache thì trả Future đã xong.
+        try: st = os.stat(path)
+        except OSError as e:
+            f = concurrent.futures.Future(); f.set_result({"size": None, "code": "unreadable", "reason": f"cannot read: {e.strerror or e}"}); return f
+        cached = get_ledger().cached_preflight(path, st.st_size, st.st_mtime_ns)
+        if cached is not None:
+            f = concurrent.futures.Future(); f.set_result(cached); return f
+        future = self.run(preflight.probe, path)
+        def store(f):
+            if f.exception() is None and f.result()["code"] != "unreadable": get_ledger().store_preflight(path, st.st_size, st.st_mtime_ns, f.result())
+        future.add_done_callback(store)
+        return future
+
+    def verdict(self, future, path):
+        # -> (code, lý do) nếu video bị loại, None nếu upload được.
+        try: info = future.result()
+        except concurrent.futures.BrokenExecutor:
+            with self.lock: self.executor = self.threads
+            info = preflight.probe(path)
+        except Exception as e:
+            # Lỗi của chính bộ kiểm tra không được chặn upload; YouTube vẫn là nơi phán cuối.
+            print(f"Pre-flight check failed for {path}: {e}"); return None
+        cfg = CURRENT_SETTINGS
+        return preflight.check(info, float(cfg.get("maxVideoMinutes", DEFAULT_SETTINGS["maxVideoMinutes"]) or 0) * 60,
+                               float(cfg.get("maxVideoGB", DEFAULT_SETTINGS["maxVideoGB"]) or 0) * 1024 ** 3)
+
+    def stage(self, items, on_reject, lookahead=PREFLIGHT_LOOKAHEAD):
+        # Bọc generator danh sách chờ: chỉ cho qua video hợp lệ, video bị loại báo qua on_reject(data, code, reason).
+        buf = collections.deque()
+        def pop():
+            data, future = buf.popleft()
+            bad = self.verdict(future, data['video'])
+            if bad: on_reject(data, *bad); return None
+            return data
+        for item in items:
+            buf.append((item, self.submit(item['video'])))
+            if len(buf) > lookahead:
+                data = pop()
+                if data is not None: yield data
+        while buf:
+            data = pop()
+            if data is not None: yield data
+
+    def shutdown(self):
+        # Tắt pool process trước khi interpreter dọn module (tránh lỗi in ra lúc thoát).
+        with self.lock: executor, self.executor = self.executor, None
+        if executor is not None and executor is not self.threads: executor.shutdown(wait=True, cancel_futures=True)
+
+PREFLIGHT = Preflight()
+atexit.register(PREFLIGHT.shutdown)
+
+# =============================================================================
+# THUMBNAIL STAGE
+# =============================================================================
+# Video qua pre-flight thì thumbnail của nó được đưa về chuẩn YouTube (thumbnails.prepare,
+# trên pool của PREFLIGHT) trong lúc các video trước còn đang upload. Tới bước sau upload,
+# thumbnails.set chỉ còn gửi một file JPEG nhỏ đã chắc chắn hợp lệ; ảnh không thể dùng
+# (hỏng, quá 2 MB mà không có Pillow) thì bỏ qua có lý do, không tốn 50 quota.
+
+class ThumbnailStage:
+    def __init__(self, cache_dir=THUMB_CACHE_DIR):
+        self.cache_dir = os.path.abspath(cache_dir)
+
+    def stage(self, items):
+        for item in items:
+            if item.get('thumb'): item['thumb_job'] = PREFLIGHT.run(thumbnails.prepare, item['thumb'], self.cache_dir)
+            yield item
+
+    def resolve(self, data):
+        # -> (file để gửi hoặc None, ghi chú cho log hoặc None)
+        job = data.get('thumb_job')
+        if job is None: return data.get('thumb'), None
+        try: res = job.result()
+        except concurrent.futures.BrokenExecutor: res = thumbnails.prepare(data['thumb'], self.cache_dir)
+        except Exception as e:
+            METRICS.inc("thumbnails_total", result="original")
+            return data['thumb'], f"cannot prepare ({e}), sending the original"
+        if res['path'] is None:
+            METRICS.inc("thumbnails_total", result="skipped")
+            return None, f"skipped, {res['reason']}"
+        METRICS.inc("thumbnails_total", result="cached" if res['cached'] else "prepared" if res['note'] else "original")
+        return res['path'], f"prepared {res['note']}" if res['note'] and not res['cached'] else None
+
+THUMBNAILS = ThumbnailStage()
+
+# =============================================================================
+# QUOTA SCHEDULER
+# =============================================================================
+# Mọi tài khoản dùng chung một client secret = chung quota ngày của một Google Cloud project
+# (khoá theo client_id). Mỗi lời gọi API bị trừ ngay khi chạy; trước khi upload, dòng phải
+# giữ chỗ (reserve) đủ quota cho insert + thumbnail + playlist, không đủ thì dòng được hoãn
+# tới nửa đêm giờ Thái Bình Dương (giờ reset quota) và pool tự chạy lại nó.
+# reserve() trả về một QuotaReservation; lời gọi API thuộc lần upload đó charge() kèm
+# reservation nên phần bị trừ được rút khỏi chỗ đã giữ trong cùng một bước (không tính 2 lần),
+# phần còn thừa trả lại bằng release().
+
+QUOTA_COSTS = {"videos.insert": 1600, "thumbnails.set": 50, "playlistItems.insert": 50, "playlists.list": 1}
+
+try: PACIFIC_TZ = zoneinfo.ZoneInfo("America/Los_Angeles")
+except Exception: PACIFIC_TZ = datetime.timezone(datetime.timedelta(hours=-8))  # Thiếu tzdata (Windows): bỏ qua giờ mùa hè.
+
+class QuotaReservation:
+    __slots__ = ("project", "units")
+
+    def __init__(self, project, units): self.project = project; self.units = units
+
+class QuotaTracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reserved = collections.Counter()
+
+    def today(self):
+        return datetime.datetime.now(PACIFIC_TZ).date().isoformat()
+
+    def next_reset(self):
+        now = datetime.datetime.now(PACIFIC_TZ)
+        return datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(0, 0), tzinfo=PACIFIC_TZ)
+
+    def seconds_until_reset(self):
+        return max(1.0, (self.next_reset() - datetime.datetime.now(PACIFIC_TZ)).total_seconds())
+
+    def limit(self, project, secret=None):
+        cfg = CURRENT_SETTINGS
+        overrides = cfg.get("quotaOverrides") or {}
+        if secret in overrides: return int(overrides[secret])
+        if project in overrides: return int(overrides[project])
+        return int(cfg.get("quotaPerProject", DEFAULT_SETTINGS["quotaPerProject"]))
+
+    def used(self, project):
+        return get_ledger().quota_used(project, self.today())
+
+    def remaining(self, project, secret=None):
+        with self.lock: return self.limit(project, secret) - self.used(project) - self.reserved[project]
+
+    def charge(self, project, op, units=None, reservation=None):
+        units = QUOTA_COSTS.get(op, 1) if units is None else units
+        with self.lock:
+            get_ledger().add_quota(project, self.today(), units)
+            if reservation is not None:
+                take = min(units, reservation.units)
+                reservation.units -= take; self.reserved[reservation.project] -= take
+        METRICS.inc("quota_units_total", units, project=project, op=op)
+
+    def reserve(self, project, units, secret=None):
+        # -> QuotaReservation, hoặc None nếu không còn đủ quota.
+        with self.lock:
+            if self.limit(project, secret) - self.used(project) - self.reserved[project] < units: return None
+            self.reserved[project] += units
+            return QuotaReservation(project, units)
+
+    def split(self, reservation, units):
+        # Tách một phần chỗ đã giữ sang việc khác (vd. PostUploadQueue), tổng đã giữ không đổi.
+        with self.lock:
+            take = min(units, reservation.units); reservation.units -= take
+            return QuotaReservation(reservation.project, take)
+
+    def release(self, reservation):
+        if reservation is None: return
+        with self.lock:
+            self.reserved[reservation.project] = max(0, self.reserved[reservation.project] - reservation.units)
+            reservation.units = 0
+
+    def exhaust(self, project, secret=None):
+        # Google báo quotaExceeded -> coi như đã dùng hết quota hôm nay.
+        get_ledger().set_quota(project, self.today(), self.limit(project, secret))
+
+QUOTA = QuotaTracker()
+
+def upload_quota_cost(video_data, config):
+    cost = QUOTA_COSTS["videos.insert"]
+    if video_data.get('thumb'): cost += QUOTA_COSTS["thumbnails.set"]
+    if config.get('playlist_id'): cost += QUOTA_COSTS["playlistItems.insert"]
+    return cost
+
+# =============================================================================
+# SCHEDULE PLANNER
+# =============================================================================
+# Lịch đăng của một tài khoản: các khung giờ trong ngày (theo múi giờ tz), hết khung
+# của một ngày thì nhảy 1 + gap ngày. Giờ đã đặt (ledger, phiên upload dở) được nạp vào
+# booked: lịch mới nối tiếp sau giờ đã đặt muộn nhất và không bao giờ trùng một giờ đã đặt.
+
+@functools.lru_cache(maxsize=1024)
+def parse_slots(slots_string):
+    slots = set()
+    for s in str(slots_string or "").split(","):
+        try: slots.add(datetime.datetime.strptime(s.strip(), "%H:%M").time())
+        except ValueError: pass
+    return tuple(sorted(slots)) or (datetime.time(8, 0),)
+
+def resolve_tz(tz):
+    if isinstance(tz, str) and tz:
+        try: return zoneinfo.ZoneInfo(tz)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError): pass
+    return tz if isinstance(tz, datetime.tzinfo) else datetime.datetime.now().astimezone().tzinfo
+
+class SchedulePlanner:
+    def __init__(self, slots, day_gap=0, tz=None, booked=(), now=None):
+        self.slots = parse_slots(slots) if isinstance(slots, str) else tuple(sorted(slots))
+        self.gap = max(0, int(day_gap or 0))
+        self.tz = resolve_tz(tz)
+        self.now = now
+        self.booked = set()   # Giờ đã đặt, lưu dạng epoch giây.
+        self.cursor = None
+        self.cursor_ts = None
+        self.day_key = None
+        self.day_cache = []
+        now_ts = self._now_ts()
+        for dt in booked: self.book(dt, now_ts)
+
+    def _now_ts(self):
+        return (self.now or datetime.datetime.now(datetime.timezone.utc)).timestamp()
+
+    def book(self, dt, now_ts=None):
+        # Đánh dấu giờ đã đặt; giờ tương lai muộn nhất làm mốc cho lịch tiếp theo.
+        ts = dt.timestamp(); self.booked.add(int(ts))
+        if ts > (self._now_ts() if now_ts is None else now_ts) and (self.cursor_ts is None or ts > self.cursor_ts):
+            self.cursor = dt; self.cursor_ts = ts
+
+    def unbook(self, dt, prev_cursor):
+        # Hoàn lại giờ vừa cấp (upload bị hoãn, video sẽ được xếp lại).
+        self.booked.discard(int(dt.timestamp()))
+        self.cursor = prev_cursor; self.cursor_ts = prev_cursor.timestamp() if prev_cursor else None
+
+    def next(self, now_ts=None):
+        now_ts = self._now_ts() if now_ts is None else now_ts
+        if self.cursor_ts is not None and self.cursor_ts > now_ts:
+            ref_ts = self.cursor_ts; ref = self.cursor if self.cursor.tzinfo is self.tz else self.cursor.astimezone(self.tz); step = datetime.timedelta(days=1 + self.gap)
+        else:
+            ref_ts = now_ts; ref = datetime.datetime.fromtimestamp(now_ts, self.tz); step = datetime.timedelta(days=1)
+        day = ref.date(); booked = self.booked
+        while True:
+            for dt, ts in self._day_slots(day):
+                if ts > ref_ts and int(ts) not in booked:
+                    booked.add(int(ts)); self.cursor = dt; self.cursor_ts = ts
+                    return dt
+            day += step
+
+    def _day_slots(self, day):
+        # Các lần next() liên tiếp thường rơi vào cùng một ngày -> nhớ datetime/epoch của ngày đó.
+        if self.day_key != day:
+            self.day_key = day
+            self.day_cache = [(dt, dt.timestamp()) for dt in (datetime.datetime.combine(day, t, tzinfo=self.tz) for t in self.slots)]
+        return self.day_cache
+
+    def plan(self, n):
+        now_ts = self._now_ts()
+        return [self.next(now_ts) for _ in range(n)]
+
+def planner_for(account, slots, day_gap, tz=None, booked=None):
+    # booked=None: đọc giờ đã đặt của tài khoản từ ledger.
+    if booked is None: booked = get_ledger().booked_times(account=account).get(account, [])
+    return SchedulePlanner(slots, day_gap, tz, booked)
+
+CHUNK_UNIT = 256 * 1024  # Google yêu cầu mỗi chunk (trừ chunk cuối) là bội số của 256 KiB.
+
+class ChunkSizer:
+    # Chọn kích thước chunk theo đo đạc thực tế. Mô hình: thời gian 1 chunk = RTT + size/băng thông.
+    # RTT và băng thông ước lượng bằng hồi quy tuyến tính trên vài chunk gần nhất; chunk mới đủ lớn
+    # để RTT chỉ chiếm ~10% và đủ khoảng target_seconds dữ liệu, tăng tối đa x2 mỗi bước,
+    # giảm x4 khi lỗi (retry gửi lại ít byte hơn).
+    def __init__(self, minimum=1024*1024, maximum=64*1024*1024, initial=8*1024*1024, target_seconds=5.0, window=8):
+        self.minimum = max(CHUNK_UNIT, minimum - minimum % CHUNK_UNIT)
+        self.maximum = max(self.minimum, maximum - maximum % CHUNK_UNIT)
+        self.target_seconds = target_seconds
+        self.samples = collections.deque(maxlen=window)
+        self.size = self._clamp(initial)
+        self.rtt = None
+        self.bandwidth = None
+
+    def _clamp(self, n):
+        n = int(n) - int(n) % CHUNK_UNIT
+        return max(self.minimum, min(self.maximum, n))
+
+    def current(self):
+        return self.size
+
+    def _estimate(self):
+        n = len(self.samples)
+        mean_x = sum(x for x, _ in self.samples) / n
+        mean_y = sum(y for _, y in self.samples) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in self.samples)
+        if var_x > 0:
+            slope = sum((x - mean_x) * (y - mean_y) for x, y in self.samples) / var_x
+            if slope > 0:
+                self.bandwidth = 1.0 / slope
+                self.rtt = max(0.0, mean_y - slope * mean_x)
+                return
+        self.bandwidth = mean_x / mean_y if mean_y > 0 else None
+
+    def record(self, nbytes, seconds):
+        if nbytes <= 0 or seconds <= 0: return
+        self.samples.append((nbytes, seconds))
+        self._estimate()
+        if not self.bandwidth: return
+        desired = self.bandwidth * self.target_seconds
+        if self.rtt: desired = max(desired, self.bandwidth * self.rtt * 9)
+        self.size = self._clamp(min(desired, self.size * 2))
+
+    def on_error(self):
+        self.samples.clear()
+        self.size = self._clamp(self.size // 4)
+
+def make_chunk_sizer():
+    cfg = CURRENT_SETTINGS
+    mb = 1024 * 1024
+    return ChunkSizer(minimum=int(float(cfg.get("chunkMinMB", DEFAULT_SETTINGS["chunkMinMB"])) * mb),
+                      maximum=int(float(cfg.get("chunkMaxMB", DEFAULT_SETTINGS["chunkMaxMB"])) * mb))
+
+# =============================================================================
+# MEDIA SOURCE
+# =============================================================================
+# mediaSource = "mmap": file video được map vào bộ nhớ, mỗi chunk là một memoryview cắt từ
+# vùng map -> không cấp phát bytes mới cho từng chunk, retry gửi lại đúng vùng đó, dữ liệu đi
+# thẳng từ page cache xuống socket. Các trang server đã nhận (trước offset hiện tại) được trả
+# lại bằng MADV_DONTNEED để RSS chỉ giữ cỡ một chunk. "read": đọc từng chunk ra bytes như cũ.
+# Chunk luôn là bytes/memoryview chứ không phải stream: khi server cắt kết nối sau khi nhận
+# body, httplib2 tự gửi lại đúng body đó một lần -> stream đã đọc hết thành 0 byte và request
+# treo tới hết timeout.
+
+@functools.lru_cache(maxsize=None)
+def local_media_class():
+    from googleapiclient.http import MediaFileUpload
+
+    class LocalMediaUpload(MediaFileUpload):
+        def __init__(self, filename, mapped=True, flow=None, weight=1.0, **kwargs):
+            super().__init__(filename, **kwargs)
+            self._map = self._view = None; self._dropped = 0
+            self.flow = flow; self.weight = weight
+            if mapped and self.size():
+                self._map = mmap.mmap(self._fd.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._map)
+                if hasattr(mmap, "MADV_SEQUENTIAL"): self._map.madvise(mmap.MADV_SEQUENTIAL)
+
+        def has_stream(self): return False
+
+        def getbytes(self, begin, length):
+            if self._view is None: data = super().getbytes(begin, length)
+            else:
+                keep = begin // mmap.PAGESIZE * mmap.PAGESIZE
+                if hasattr(mmap, "MADV_DONTNEED") and keep > self._dropped:
+                    self._map.madvise(mmap.MADV_DONTNEED, self._dropped, keep - self._dropped); self._dropped = keep
+                data = self._view[begin:begin + length]
+            return ShapedBody(data, self.flow, self.weight) if SHAPER.active() else data
+
+        def close(self):
+            if getattr(self, "_view", None) is not None:
+                self._view = None
+                # Còn slice đang bị giữ (vd. body của request lỗi) -> để GC đóng map.
+                try: self._map.close()
+                except BufferError: pass
+            if getattr(self, "_fd", None): self._fd.close()
+
+        def __del__(self): self.close()
+
+    return LocalMediaUpload
+
+def open_media(path, chunksize, flow=None, weight=1.0):
+    mapped = CURRENT_SETTINGS.get("mediaSource", DEFAULT_SETTINGS["mediaSource"]) == "mmap"
+    return local_media_class()(path, mapped=mapped, flow=flow, weight=weight, chunksize=chunksize, resumable=True)
+
+# =============================================================================
+# BANDWIDTH SHAPER
+# =============================================================================
+# Giới hạn tổng byte/s upload của cả app (bandwidthLimitMbps, 0 = không giới hạn) và chia
+# theo trọng số từng dòng (weight). Mỗi luồng (flow = một dòng đang upload) có đồng hồ ảo
+# riêng: xin gửi n byte -> được hẹn giờ gửi theo phần băng thông rate * w / tổng w của các
+# luồng ĐANG gửi. Dòng rảnh (tạm dừng, chờ quota, xong) tự rơi khỏi tổng sau SHAPER_IDLE
+# giây nên phần của nó chia lại cho các dòng còn lại. Đồng hồ chung của cả link đảm bảo
+# tổng không vượt giới hạn. delay() chỉ trả số giây phải chờ: luồng thread thì sleep,
+# coroutine thì asyncio.sleep.
+
+SHAPER_IDLE = 1.0
+SHAPE_BLOCK = 256 * 1024
+
+class BandwidthShaper:
+    def __init__(self, rate=0, idle=SHAPER_IDLE):
+        self.rate = rate
+        self.idle = idle
+        self.flows = {}       # flow -> [next_start, weight]
+        self.link_next = 0.0
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self.lock: self.rate = max(0, rate); self.link_next = 0.0
+
+    def active(self): return self.rate > 0
+
+    def delay(self, flow, n, weight=1.0):
+        if not self.rate: return 0.0
+        now = time.monotonic(); weight = max(0.01, float(weight or 1))
+        with self.lock:
+            st = self.flows.get(flow)
+            if st is None: st = self.flows[flow] = [now, weight]
+            st[1] = weight
+            # Còn đang gửi = lần hẹn trước chưa quá idle giây.
+            total = sum(w for f, (nxt, w) in self.flows.items() if f == flow or nxt + self.idle >= now)
+            start = max(now, st[0], self.link_next)
+            st[0] = start + n * total / (self.rate * weight)
+            self.link_next = max(now, self.link_next) + n / self.rate
+            return start - now
+
+    def release(self, flow):
+        with self.lock: self.flows.pop(flow, None)
+
+    def shares(self):
+        # {flow: byte/s hiện được chia} cho các luồng đang gửi (hiển thị / bench).
+        now = time.monotonic()
+        with self.lock:
+            live = {f: w for f, (nxt, w) in self.flows.items() if nxt + self.idle >= now}
+            total = sum(live.values())
+            return {f: self.rate * w / total for f, w in live.items()} if self.rate and total else {}
+
+SHAPER = BandwidthShaper()
+
+def configure_shaper():
+    SHAPER.set_rate(float(CURRENT_SETTINGS.get("bandwidthLimitMbps", DEFAULT_SETTINGS["bandwidthLimitMbps"]) or 0) * 1e6 / 8)
+
+class ShapedBody:
+    # Body của một chunk dưới dạng iterable: http.client gửi từng khối SHAPE_BLOCK, mỗi khối chờ
+    # SHAPER cho phép. Iterable (không phải stream) nên httplib2 gửi lại được từ đầu nếu retry ngầm.
+    def __init__(self, data, flow, weight=1.0, block=SHAPE_BLOCK):
+        self.data = data; self.flow = flow; self.weight = weight; self.block = block
+
+    def __len__(self): return len(self.data)
+
+    def __iter__(self):
+        view = memoryview(self.data)
+        for i in range(0, len(view), self.block):
+            piece = view[i:i + self.block]
+            d = SHAPER.delay(self.flow, len(piece), self.weight)
+            if d > 0: time.sleep(d)
+            yield piece
+
+UPLOAD_SESSION_FILE = "upload_session.json"
+SESSION_MAX_AGE = 6 * 24 * 3600  # URI phiên resumable của Google hết hạn sau khoảng 1 tuần.
+
+def load_upload_session(folder, video_path, account):
+    path = os.path.join(folder, UPLOAD_SESSION_FILE)
+    sess = load_json(path, None)
+    if not isinstance(sess, dict) or not sess.get('uri'): return None
+    try: st = os.stat(video_path)
+    except OSError: return None
+    if (sess.get('video') != os.path.basename(video_path) or sess.get('size') != st.st_size
+            or sess.get('mtime') != int(st.st_mtime) or sess.get('account') != account
+            or time.time() - sess.get('created', 0) > SESSION_MAX_AGE):
+        clear_upload_session(folder); return None
+    return sess
+
+def save_upload_session(folder, sess):
+    path = os.path.join(folder, UPLOAD_SESSION_FILE)
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f: json.dump(sess, f, indent=4)
+        os.replace(path + ".tmp", path)
+    except OSError as e: print(f"Cannot save upload session {path}: {e}")
+
+def clear_upload_session(folder):
+    try: os.remove(os.path.join(folder, UPLOAD_SESSION_FILE))
+    except OSError: pass
+
+def build_video_body(video_data, publish_time, specific_category, log_func):
+    cfg = CURRENT_SETTINGS
+    final_cat = specific_category if (specific_category and specific_category != "default") else cfg.get("categoryId", "22")
+    publish_at = publish_time.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    lang_code = cfg.get("languageCode", "en-US")
+    loc_key = cfg.get("locationKey", "United States")
+    loc_data = YT_LOCATIONS.get(loc_key, YT_LOCATIONS["No Location"])
+    if loc_key not in YT_LOCATIONS:
+        for k, v in YT_LOCATIONS.items():
+            if k in loc_key or loc_key in k: loc_data = v; break
+
+    log_func(f"   -> Lang: {lang_code} | Loc: {loc_data['desc']}")
+    
+    body = {
+        "snippet": {
+            "title": video_data['title'],
+            "description": video_data['desc'],
+            "tags": video_data['tags'],
+            "categoryId": final_cat,
+            "defaultLanguage": lang_code,       
+            "defaultAudioLanguage": lang_code   
+        },
+        "status": {
+            "privacyStatus": "private",
+            "publishAt": publish_at,
+            "selfDeclaredMadeForKids": False,
+            "containsSyntheticMedia": True,
+            "embeddable": True,
+            "license": "youtube"
+        },
+        "recordingDetails": {
+            "locationDescription": loc_data["desc"],
+            "location": {"latitude": loc_data["lat"], "longitude": loc_data["long"]}
+        }
+    }
+    return body
+
+def new_upload_session(video_path, account, publish_time):
+    st = os.stat(video_path)
+    return {"uri": None, "offset": 0, "video": os.path.basename(video_path), "size": st.st_size,
+            "mtime": int(st.st_mtime), "account": account, "publish_time": publish_time.isoformat(), "created": time.time()}
+
+class UploadPaused(Exception):
+    # Dòng bị Pause giữa 2 chunk: execute_upload trả luồng về pool thay vì pause_event.wait().
+    # Phiên resumable đã lưu sau mỗi chunk -> khi Resume, RowJob gọi lại và gửi tiếp từ byte đã nhận.
+    pass
+
+def execute_upload(youtube, video_data, publish_time, specific_category, progress_callback, pause_event, log_func, account="", project=None, flow=None, weight=1.0, quota=None):
+    body = build_video_body(video_data, publish_time, specific_category, log_func)
+    sizer = make_chunk_sizer()
+    media = open_media(video_data['video'], sizer.current(), flow, weight)
+    request = youtube.videos().insert(part="snippet,status,recordingDetails", body=body, media_body=media)
+    
+    # Nếu còn phiên cũ (app tắt giữa chừng): gắn lại URI và bật _in_error_state để
+    # next_chunk() hỏi server số byte đã nhận rồi gửi tiếp từ đó.
+    folder = video_data['folder']
+    sess = load_upload_session(folder, video_data['video'], account)
+    if sess:
+        request.resumable_uri = sess['uri']; request._in_error_state = True
+        log_func(f"   -> Resume upload session ({sess.get('offset', 0) * 100 // max(1, sess['size'])}% saved)")
+    else: sess = new_upload_session(video_data['video'], account, publish_time)
+
+    resp = None
+    attempt = 0
+    def on_retry(n, cause, delay): progress_callback(f"Retry {n} ({cause}) in {delay:.0f}s...")
+
+    try:
+        while resp is None:
+            if not pause_event.is_set(): raise UploadPaused()
+
+            try:
+                media._chunksize = sizer.current()
+                new_session = request.resumable_uri is None or request._in_error_state
+                start_byte = request.resumable_progress; t0 = time.monotonic()
+                had_session = request.resumable_uri is not None
+                try: stat, resp = request.next_chunk()
+                finally:
+                    # videos.insert bị tính quota khi mở phiên upload mới (phiên resume thì không).
+                    if project and not had_session and request.resumable_uri is not None: QUOTA.charge(project, "videos.insert", reservation=quota)
+                if resp is None and request.resumable_uri and (request.resumable_uri != sess['uri'] or request.resumable_progress != sess['offset']):
+                    if request.resumable_uri != sess['uri']: sess['created'] = time.time()
+                    sess['uri'] = request.resumable_uri; sess['offset'] = request.resumable_progress
+                    save_upload_session(folder, sess)
+                # Chunk đầu còn kèm request mở phiên upload -> không dùng để đo.
+                sent = (media.size() if resp is not None else request.resumable_progress) - start_byte
+                if not new_session:
+                    sizer.record(sent, time.monotonic() - t0)
+                    METRICS.observe("chunk_seconds", time.monotonic() - t0, transport="thread", account=account)
+                if sent > 0: METRICS.inc("chunk_bytes_total", sent, transport="thread", account=account)
+                attempt = 0
+                if stat:
+                    pct = int(stat.progress() * 100)
+                    progress_callback(f"Upload {pct}%", stat.resumable_progress, stat.total_size)
+            except HttpError as e:
+                if e.resp.status in [404, 410] and request.resumable_uri == sess['uri'] and request._in_error_state:
+                    # Phiên đã hết hạn trên server -> bỏ và mở phiên mới từ byte 0.
+                    log_func("   -> Upload session expired, starting a new one")
+                    clear_upload_session(folder)
+                    request.resumable_uri = None; request.resumable_progress = 0; request._in_error_state = False
+                    sess['uri'] = None; sess['offset'] = 0
+                    continue
+                sizer.on_error()
+                RETRY_POLICY.backoff(e, attempt, account, on_retry); attempt += 1
+            except Exception as e:
+                sizer.on_error()
+                RETRY_POLICY.backoff(e, attempt, account, on_retry); attempt += 1
+    finally: media.close()
+
+    clear_upload_session(folder)
+    # Thumbnail / playlist do PostUploadQueue xử lý để luồng upload rảnh ngay.
+    return resp.get("id")
+
+# =============================================================================
+# POST-UPLOAD QUEUE
+# =============================================================================
+# Đặt thumbnail và thêm vào playlist chạy ở luồng riêng. Video vừa upload xong thường
+# chưa "thấy" được ngay (playlist trả 404 videoNotFound), nên việc đầu tiên được hẹn sau
+# POST_FIRST_DELAY giây thay vì sleep trong luồng upload. Retry đi qua RETRY_POLICY.plan như
+# upload (ngân sách retry, Retry-After, retries_total) nhưng hẹn lại trong hàng đợi, không sleep.
+
+POST_FIRST_DELAY = 5
+POST_MAX_ATTEMPTS = 6
+POST_RETRY_MIN = 5
+POST_NOT_READY = {"videoNotFound", "notFound", "http404"}
+
+class PostTask:
+    def __init__(self, row_id, op, make_request, label, account, project, quota=None, secret=None):
+        self.row_id = row_id
+        self.op = op
+        self.make_request = make_request
+        self.label = label
+        self.account = account
+        self.project = project
+        self.secret = secret  # Cho quotaOverrides khoá theo client secret.
+        self.quota = quota  # Phần quota RowJob đã giữ cho việc này; charge() rút dần, còn thừa trả lại khi xong.
+        self.attempt = 0
+
+class PostUploadQueue:
+    def __init__(self, emit, workers=2):
+        self.emit = emit
+        self.heap = []
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.running = 0
+        for _ in range(workers): threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, task, delay=0.0):
+        with self.cond:
+            heapq.heappush(self.heap, (time.monotonic() + delay, next(self.seq), task))
+            self.cond.notify()
+
+    def thumbnail(self, row_id, youtube, video_id, thumb, account="", project=None, quota=None, secret=None):
+        from googleapiclient.http import MediaFileUpload
+        make = lambda: youtube.thumbnails().set(videoId=video_id, media_body=MediaFileUpload(thumb))
+        self.submit(PostTask(row_id, "thumbnails.set", make, "Thumbnail", account, project, quota, secret))
+
+    def playlist(self, row_id, youtube, video_id, playlist_id, account="", project=None, quota=None, secret=None):
+        make = lambda: playlist_item_request(youtube, video_id, playlist_id)
+        self.submit(PostTask(row_id, "playlistItems.insert", make, f"Playlist {playlist_id}", account, project, quota, secret), POST_FIRST_DELAY)
+
+    def pending(self):
+        with self.cond: return len(self.heap) + self.running
+
+    def _take(self):
+        with self.cond:
+            while True:
+                if self.heap:
+                    wait = self.heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        self.running += 1
+                        return heapq.heappop(self.heap)[2]
+                    self.cond.wait(wait)
+                else: self.cond.wait()
+
+    def _worker(self):
+        while True:
+            task = self._take()
+            try: self._run(task)
+            except Exception as e: self._done(task, f"FAILED: {e}")
+            finally:
+                with self.cond: self.running -= 1
+
+    def _done(self, task, result):
+        QUOTA.release(task.quota)
+        self.emit(task.row_id, "log", text=f"   -> {task.label}: {result}")
+
+    def _run(self, task):
+        task.attempt += 1
+        try:
+            try: task.make_request().execute()
+            finally:
+                if task.project: QUOTA.charge(task.project, task.op, reservation=task.quota)
+            return self._done(task, "OK")
+        except Exception as e:
+            if RETRY_POLICY.classify(e)[1] == "quotaExceeded":
+                if task.project: QUOTA.exhaust(task.project, task.secret)
+                self.emit(task.row_id, "log", text=f"   -> {task.label}: quota used up, retry after reset")
+                return self.submit(task, QUOTA.seconds_until_reset() + random.uniform(30, 300))
+            try: delay = RETRY_POLICY.plan(e, task.attempt - 1, task.account, extra_causes=POST_NOT_READY, max_attempts=POST_MAX_ATTEMPTS)
+            except RetryBudgetExceeded:
+                # API đang lỗi diện rộng: chờ như RowJob, lần này không tính vào số lần thử.
+                task.attempt -= 1
+                return self.submit(task, RETRY_COOLDOWN)
+            except Exception: return self._done(task, f"FAILED after {task.attempt} tries: {e}")
+            self.submit(task, max(POST_RETRY_MIN, delay))
+
+
+# =============================================================================
+# ROW STATUS BOARD
+# =============================================================================
+# Worker không đẩy từng thay đổi tới giao diện: nó chỉ ghi vào bản ghi trạng thái
+# của dòng (state, %, byte/s, ETA) và đánh dấu dòng đó đã đổi. Giao diện lấy các dòng
+# đã đổi bằng changed() theo nhịp cố định -> nhiều cập nhật giữa hai khung gộp làm một.
+
+RATE_WINDOW = 1.0    # Giây tối thiểu giữa hai lần đo tốc độ.
+RATE_SMOOTH = 0.3    # Hệ số EWMA cho tốc độ.
+
+class RowStatus:
+    __slots__ = ("state", "text", "color", "percent", "rate", "eta", "done", "total", "mark_t", "mark_b")
+
+    def __init__(self):
+        self.state = "idle"; self.text = ""; self.color = "black"
+        self.clear_progress()
+
+    def clear_progress(self):
+        self.percent = None; self.rate = 0.0; self.eta = None
+        self.done = self.total = 0; self.mark_t = None; self.mark_b = 0
+
+    def snapshot(self):
+        return {"state": self.state, "text": self.text, "color": self.color, "percent": self.percent,
+                "rate": self.rate, "eta": self.eta, "done": self.done, "total": self.total}
+
+class StatusBoard:
+    def __init__(self):
+        self.rows = {}
+        self.dirty = set()
+        self.lock = threading.Lock()
+
+    def _rec(self, row_id):
+        rec = self.rows.get(row_id)
+        if rec is None: rec = self.rows[row_id] = RowStatus()
+        return rec
+
+    def update(self, row_id, text=None, color=None, state=None):
+        # Đổi chữ trạng thái = bước khác -> bỏ số liệu tiến độ của bước trước.
+        with self.lock:
+            rec = self._rec(row_id)
+            if text is not None: rec.text = text; rec.clear_progress()
+            if color is not None: rec.color = color
+            if state is not None: rec.state = state
+            self.dirty.add(row_id)
+
+    def progress(self, row_id, done, total, text=None, color=None):
+        now = time.monotonic()
+        with self.lock:
+            rec = self._rec(row_id)
+            if rec.mark_t is None or done < rec.mark_b or total != rec.total: rec.mark_t = now; rec.mark_b = done; rec.rate = 0.0
+            elif now - rec.mark_t >= RATE_WINDOW:
+                inst = (done - rec.mark_b) / (now - rec.mark_t)
+                rec.rate = inst if not rec.rate else rec.rate + RATE_SMOOTH * (inst - rec.rate)
+                rec.mark_t = now; rec.mark_b = done
+            rec.done = done; rec.total = total
+            rec.percent = done * 100 // total if total else None
+            rec.eta = (total - done) / rec.rate if rec.rate > 0 else None
+            if text is not None: rec.text = text
+            if color is not None: rec.color = color
+            self.dirty.add(row_id)
+
+    def get(self, row_id):
+        with self.lock:
+            rec = self.rows.get(row_id)
+            return rec.snapshot() if rec else None
+
+    def changed(self):
+        # {row_id: snapshot} của các dòng đổi từ lần gọi trước.
+        with self.lock:
+            out = {r: self.rows[r].snapshot() for r in self.dirty}
+            self.dirty.clear()
+        return out
+
+# =============================================================================
+# UPLOAD ENGINE (HEADLESS)
+# =============================================================================
+# Job chạy không cần giao diện: mọi thay đổi trạng thái được gửi thành event
+# (dict có 'row', 'kind', 'ts') tới các listener. GUI Tk chỉ là một listener.
+# Mỗi dòng là một RowJob chạy từng bước (1 bước = 1 video) trên UploadPool dùng
+# chung, nên số luồng upload bị giới hạn dù có hàng trăm dòng.
+
+def record_upload_metrics(account, ctx, vid_id, error):
+    # Hoãn vì ngân sách retry cạn hoặc hết quota: video sẽ được upload lại, không tính là lỗi.
+    result = "ok" if error is None else ("deferred" if isinstance(error, RetryBudgetExceeded) or is_quota_exceeded(error) else "failed")
+    METRICS.inc("uploads_total", account=account, result=result)
+    if error is None:
+        METRICS.inc("upload_bytes_total", ctx['size'], account=account)
+        METRICS.observe("upload_bytes_per_second", ctx['size'] / max(1e-6, time.monotonic() - ctx['t0']), account=account)
+
+class RowJob:
+    def __init__(self, row_id, config, engine, pause_event):
+        self.row_id = row_id
+        self.config = config
+        self.engine = engine
+        self.pause_event = pause_event
+        self.account = config['acc']
+        self.secret = config['secret']
+        self.acc_display = config['acc'].replace(".json", "")
+        self.yt = None
+        self.pending = None
+        self.current = None
+        self.project = None
+        self.inflight = None   # (Future, ctx) khi upload đang chạy trên transport async.
+        self.parked = None     # ctx của video đang upload dở khi dòng bị Pause (transport thread).
+        self.holding = False   # Đang giữ suất tài khoản/secret trong pool dù không chiếm luồng.
+        self.idx = 0
+        self.count_ok = 0
+        self.rejected = 0
+        self.planner = None
+        self.not_before = 0.0
+        self.finished = False
+
+    def emit(self, kind, **data): self.engine.emit(self.row_id, kind, **data)
+    def ui_update(self, text, color_key="black"):
+        self.engine.status.update(self.row_id, text, color_key); self.emit("status", text=text, color=color_key)
+    def log(self, text): self.emit("log", text=text)
+
+    def step(self):
+        # Trả về True nếu dòng còn video cần upload (pool sẽ xếp lại vào hàng đợi).
+        try:
+            if self.pending is None: return self.prepare()
+            if self.inflight is not None: return self.collect_upload()
+            if self.parked is not None: return self.resume_upload()
+            return self.upload_next()
+        except Exception as e:
+            self.ui_update("Crash", "danger"); self.log(f"[{self.acc_display}] CRASH: {e}")
+            return False
+
+    def prepare(self):
+        config = self.config
+        self.log(f"[{self.acc_display}] Init...")
+        self.ui_update("Connecting...", "primary")
+
+        self.project = get_client_id_from_file(config['secret']) or config['secret']
+        self.yt = get_authenticated_service(config['acc'], config['secret'])
+        if not self.yt: self.ui_update("Login Error", "danger"); self.log(f"[{self.acc_display}] Token Mismatch"); return False
+
+        # Nối tiếp lịch đã đặt từ các lần chạy trước thay vì xếp chồng lên cùng giờ.
+        self.planner = planner_for(config['acc'], config['time'], config['gap'], config.get('tz'))
+
+        self.ui_update("Scanning...", "info")
+        folders = FOLDER_SCANNER.folders(config['folder'])
+        if not folders: self.ui_update("EMPTY", "danger"); self.log(f"[{self.acc_display}] Folder empty!"); return False
+
+        # Danh sách chờ là generator: chỉ quét tới thư mục chờ đầu tiên rồi bắt đầu upload ngay.
+        self.pending = FINGERPRINTER.stage(THUMBNAILS.stage(PREFLIGHT.stage(FOLDER_SCANNER.iter_pending(folders, get_ledger().is_done_or_import), self.reject)))
+        self.current = next(self.pending, None)
+        if self.current is None:
+            if self.rejected: self.ui_update(f"INVALID ({self.rejected})", "danger"); self.log(f"[{self.acc_display}] No valid video left to upload."); return False
+            self.ui_update("COMPLETED", "success"); self.log(f"[{self.acc_display}] All done. Check done.json."); return False
+        self.ui_update("Queued...", "secondary")
+        return True
+
+    def skip_duplicate(self, data, digest):
+        # Trùng với video đã đăng (ledger) hoặc với video đang chờ ở dòng khác -> bỏ qua / cảnh báo.
+        skip = CURRENT_SETTINGS.get("duplicatePolicy", "skip") == "skip"
+        ledger = get_ledger(); folder = data['folder']
+        original = ledger.find_uploaded(digest, exclude_folder=folder)
+        if original:
+            self.log(f"[{self.acc_display}] Duplicate: {data['video']} was uploaded from {original['folder']} (ID {original['video_id']}){', skipped' if skip else ''}")
+            if skip: ledger.record_duplicate(folder, data['video'], self.account, digest, original); return True
+        owner = DEDUP_REGISTRY.claim(digest, self.row_id, folder)
+        if owner != (self.row_id, folder_key(folder)):
+            self.log(f"[{self.acc_display}] Duplicate: {data['video']} is already queued from {owner[1]} (row {owner[0]}){', skipped' if skip else ''}")
+            if skip: return True
+        return False
+
+    def reject(self, data, code, reason):
+        # Video không qua pre-flight: không upload, không tốn quota; lần chạy sau chỉ đọc lại cache.
+        self.rejected += 1
+        METRICS.inc("preflight_rejected_total", reason=code, account=self.account)
+        self.log(f"[{self.acc_display}] Skipped {data['folder']}: {reason}")
+
+    def advance(self):
+        self.current = next(self.pending, None)
+        if self.current is not None:
+            self.ui_update(f"Queued ({self.count_ok} OK)", "secondary")
+            return True
+        invalid = f", {self.rejected} invalid" if self.rejected else ""
+        self.ui_update(f"COMPLETED ({self.count_ok}{invalid})", "success"); self.log(f"[{self.acc_display}] FINISHED")
+        return False
+
+    def upload_next(self):
+        config = self.config; acc_display = self.acc_display
+        data, fingerprint = self.current
+        self.ui_update("Checking...", "info")
+        try: digest = fingerprint.result()
+        except OSError as e: self.log(f"[{acc_display}] Cannot read {data['video']}: {e}"); return self.advance()
+        if self.skip_duplicate(data, digest): return self.advance()
+
+        # Giữ chỗ quota trước: không đủ cho cả insert + thumbnail + playlist thì không bắt đầu.
+        cost = upload_quota_cost(data, config)
+        quota = QUOTA.reserve(self.project, cost, self.secret)
+        if quota is None: return self.defer_for_quota()
+        try: ctx = self.begin_upload(data, digest, quota)
+        except Exception: QUOTA.release(quota); raise
+        return self.run_upload(ctx)
+
+    def run_upload(self, ctx):
+        config = self.config; data = ctx['data']; quota = ctx['quota']
+        cat_id = YT_CATEGORIES.get(config['cat_name'], "default")
+        def on_progress(msg, done=None, total=None):
+            if done is not None: self.engine.status.progress(self.row_id, done, total, msg, "warning"); self.emit("status", text=msg, color="warning")
+            elif "Uploading" in msg or "Upload " in msg: self.ui_update(msg, "warning")
+        if self.engine.transport == "async":
+            # Upload chạy trên event loop của async_upload, luồng worker được trả về pool ngay.
+            from async_upload import ASYNC_TRANSPORT
+            future = ASYNC_TRANSPORT.submit(ASYNC_TRANSPORT.upload(
+                config['acc'], config['secret'], data, ctx['pub_time'], cat_id, on_progress, self.pause_event, self.log, self.project,
+                flow=self.row_id, weight=config.get('weight', 1), quota=quota))
+            self.inflight = (future, ctx); self.holding = True
+            future.add_done_callback(lambda f: self.engine.pool.wake())
+            return True
+        try: vid_id = execute_upload(self.yt, data, ctx['pub_time'], cat_id, on_progress, self.pause_event, self.log, account=config['acc'], project=self.project,
+                                     flow=self.row_id, weight=config.get('weight', 1), quota=quota)
+        except UploadPaused: return self.park_upload(ctx)
+        except Exception as e: return self.finish_upload(ctx, error=e)
+        return self.finish_upload(ctx, vid_id)
+
+    def park_upload(self, ctx):
+        # Pause: nhả luồng + suất tài khoản, giữ video, giờ đăng và quota đã giữ; pool bỏ qua dòng tới khi Resume.
+        self.parked = ctx; ctx['paused_at'] = time.monotonic()
+        SHAPER.release(self.row_id)
+        self.ui_update("Paused", "warning"); self.log(f"[{self.acc_display}] Paused: {ctx['data']['title']} (upload session saved)")
+        return True
+
+    def resume_upload(self):
+        ctx = self.parked; self.parked = None
+        ctx['t0'] += time.monotonic() - ctx.pop('paused_at')  # Thời gian Pause không tính vào thời lượng upload.
+        self.ui_update("Resuming...", "secondary")
+        return self.run_upload(ctx)
+
+    def collect_upload(self):
+        future, ctx = self.inflight
+        self.inflight = None; self.holding = False
+        try: vid_id = future.result()
+        except Exception as e: return self.finish_upload(ctx, error=e)
+        return self.finish_upload(ctx, vid_id)
+
+    def queue_post_upload(self, data, vid_id, quota):
+        # Thumbnail/playlist chạy nền; phần quota đã giữ cho chúng được tách sang PostUploadQueue.
+        post = self.engine.post; config = self.config
+        thumb, note = THUMBNAILS.resolve(data) if data.get('thumb') else (None, None)
+        if note: self.log(f"   -> Thumbnail: {note}")
+        if thumb:
+            post.thumbnail(self.row_id, self.yt, vid_id, thumb, config['acc'], self.project, QUOTA.split(quota, QUOTA_COSTS["thumbnails.set"]), self.secret)
+        if config.get('playlist_id'):
+            post.playlist(self.row_id, self.yt, vid_id, config['playlist_id'], config['acc'], self.project,
+                          QUOTA.split(quota, QUOTA_COSTS["playlistItems.insert"]), self.secret)
+
+    def defer_for_quota(self):
+        # Chờ tới giờ reset quota (+ vài phút ngẫu nhiên để các dòng không dậy cùng lúc).
+        wait = QUOTA.seconds_until_reset() + random.uniform(30, 300)
+        self.not_before = time.monotonic() + wait
+        wake = (datetime.datetime.now() + datetime.timedelta(seconds=wait)).strftime('%H:%M %d/%m')
+        self.ui_update(f"Quota wait {wake}", "warning")
+        self.log(f"[{self.acc_display}] Project quota used up ({QUOTA.remaining(self.project, self.secret)} units left), resume at {wake}")
+        return True
+
+    def begin_upload(self, data, digest, quota):
+        config = self.config; folder = data['folder']
+        self.idx += 1
+
+        self.ui_update(f"Up #{self.idx}", "warning")
+        # Video đang upload dở giữ nguyên giờ đăng đã gửi cho YouTube khi mở phiên.
+        sess = load_upload_session(folder, data['video'], config['acc'])
+        prev_cursor = self.planner.cursor
+        if sess and sess.get('publish_time'): pub_time = datetime.datetime.fromisoformat(sess['publish_time']); self.planner.book(pub_time)
+        else: pub_time = self.planner.next()
+        self.log(f"[{self.acc_display}] Up: {data['title']} ({pub_time.strftime('%H:%M %d/%m')})")
+        size = os.path.getsize(data['video'])
+        attempt = get_ledger().begin(folder, data['video'], config['acc'], config['secret'], pub_time, size, digest)
+        return {'data': data, 'digest': digest, 'quota': quota, 'pub_time': pub_time, 'prev_cursor': prev_cursor, 'attempt': attempt,
+                'size': size, 't0': time.monotonic()}
+
+    def finish_upload(self, ctx, vid_id=None, error=None):
+        config = self.config; acc_display = self.acc_display
+        data = ctx['data']; folder = data['folder']; pub_time = ctx['pub_time']
+        SHAPER.release(self.row_id)  # Dòng nghỉ giữa 2 video -> nhường băng thông ngay.
+        record_upload_metrics(config['acc'], ctx, vid_id, error)
+        try:
+            # Hoãn (ngân sách retry cạn / hết quota): dòng vẫn giữ quyền upload video này (DEDUP_REGISTRY).
+            if isinstance(error, RetryBudgetExceeded) or is_quota_exceeded(error): get_ledger().finish(ctx['attempt'], "deferred", error=str(error)); raise error
+            if error is not None: get_ledger().finish(ctx['attempt'], "failed", error=str(error)); DEDUP_REGISTRY.release(ctx['digest'], self.row_id, folder); raise error
+            get_ledger().finish(ctx['attempt'], "scheduled", video_id=vid_id)
+
+            self.queue_post_upload(data, vid_id, ctx['quota'])
+
+            if CURRENT_SETTINGS.get("writeDoneJson", True):
+                log_data = {"video_id": vid_id, "status": "Scheduled", "publish_time": str(pub_time), "account": config['acc']}
+                with open(os.path.join(folder, "done.json"), "w") as f: json.dump(log_data, f, indent=4)
+
+            self.log(f"[{acc_display}] -> OK ID: {vid_id}")
+            self.count_ok += 1
+        except RetryBudgetExceeded as e:
+            # API đang lỗi diện rộng: giữ lại video này, cho dòng nghỉ rồi thử lại.
+            self.idx -= 1; self.planner.unbook(ctx['pub_time'], ctx['prev_cursor']); self.not_before = time.monotonic() + RETRY_COOLDOWN
+            self.ui_update(f"API busy, wait {RETRY_COOLDOWN}s", "warning"); self.log(f"[{acc_display}] {e}, retry in {RETRY_COOLDOWN}s")
+            return True
+        except HttpError as e:
+            if is_quota_exceeded(e):
+                self.log(f"[{acc_display}] Quota Exceeded")
+                QUOTA.exhaust(self.project, self.secret)
+                self.idx -= 1; self.planner.unbook(ctx['pub_time'], ctx['prev_cursor'])
+                return self.defer_for_quota()
+            else: self.ui_update("API Error", "danger"); self.log(f"[{acc_display}] Err: {e}")
+        except Exception as e: self.ui_update("Error", "danger"); self.log(f"[{acc_display}] Err: {e}")
+        finally: QUOTA.release(ctx['quota'])
+
+        return self.advance()
+
+class UploadPool:
+    # Hàng đợi chung cho mọi dòng: tối đa max_workers bước chạy cùng lúc, mỗi tài khoản
+    # tối đa max_per_account, mỗi client secret tối đa max_per_secret (0 = không giới hạn).
+    def __init__(self, max_workers=4, max_per_account=1, max_per_secret=0, on_change=None, on_finish=None):
+        self.max_workers = max_workers
+        self.max_per_account = max_per_account
+        self.max_per_secret = max_per_secret
+        self.on_change = on_change
+        self.on_finish = on_finish
+        self.queue = collections.deque()
+        self.cond = threading.Condition()
+        self.workers = []
+        self.active = 0
+        self.active_accounts = collections.Counter()
+        self.active_secrets = collections.Counter()
+
+    def configure(self, max_workers=None, max_per_account=None, max_per_secret=None):
+        with self.cond:
+            if max_workers is not None: self.max_workers = max(1, int(max_workers))
+            if max_per_account is not None: self.max_per_account = max(0, int(max_per_account))
+            if max_per_secret is not None: self.max_per_secret = max(0, int(max_per_secret))
+            if self.queue: self._spawn_workers()
+            self.cond.notify_all()
+        self._changed()
+
+    def stats(self):
+        with self.cond:
+            return {'queued': len(self.queue), 'active': self.active, 'workers': self.max_workers}
+
+    def submit(self, job):
+        with self.cond:
+            self.queue.append(job)
+            self._spawn_workers()
+            self.cond.notify()
+        self._changed()
+
+    def wake(self):
+        with self.cond: self.cond.notify_all()
+
+    def _changed(self):
+        if self.on_change: self.on_change(self.stats())
+
+    def _spawn_workers(self):
+        self.workers = [w for w in self.workers if w.is_alive()]
+        while len(self.workers) < self.max_workers:
+            t = threading.Thread(target=self._worker, daemon=True)
+            self.workers.append(t); t.start()
+
+    def _runnable(self, job):
+        if job.inflight is not None: return job.inflight[0].done()
+        if not job.pause_event.is_set(): return False
+        if job.not_before > time.monotonic(): return False
+        if job.holding: return True
+        if self.max_per_account and self.active_accounts[job.account] >= self.max_per_account: return False
+        if self.max_per_secret and self.active_secrets[job.secret] >= self.max_per_secret: return False
+        return True
+
+    def _take(self):
+        with self.cond:
+            while True:
+                if self.active >= self.max_workers: return None  # Pool vừa bị thu nhỏ -> luồng thừa thoát.
+                for i, job in enumerate(self.queue):
+                    if self._runnable(job):
+                        del self.queue[i]
+                        self.active += 1
+                        if not job.holding:
+                            self.active_accounts[job.account] += 1
+                            self.active_secrets[job.secret] += 1
+                        return job
+                self.cond.wait(1.0)
+
+    def _release(self, job, more):
+        with self.cond:
+            self.active -= 1
+            if not job.holding:
+                self.active_accounts[job.account] -= 1
+                self.active_secrets[job.secret] -= 1
+            if more: self.queue.append(job)
+            self.cond.notify_all()
+
+    def _worker(self):
+        while True:
+            job = self._take()
+            if job is None:
+                with self.cond:
+                    if threading.current_thread() in self.workers: self.workers.remove(threading.current_thread())
+                return
+            self._changed()
+            more = False
+            try: more = job.step()
+            finally:
+                self._release(job, more)
+                if not more and self.on_finish: self.on_finish(job)
+                self._changed()
+
+class UploadEngine:
+    def __init__(self, max_workers=None, max_per_account=None, max_per_secret=None, activity=None, transport=None):
+        self.listeners = []
+        self.activity = activity or ActivityLog()
+        self.status = StatusBoard()
+        self.jobs = {}
+        self.lock = threading.Lock()
+        cfg = CURRENT_SETTINGS
+        self.pool = UploadPool(
+            max_workers=max_workers or int(cfg.get("maxWorkers", DEFAULT_SETTINGS["maxWorkers"])),
+            max_per_account=max_per_account if max_per_account is not None else int(cfg.get("maxPerAccount", DEFAULT_SETTINGS["maxPerAccount"])),
+            max_per_secret=max_per_secret if max_per_secret is not None else int(cfg.get("maxPerSecret", DEFAULT_SETTINGS["maxPerSecret"])),
+            on_change=self._pool_changed,
+            on_finish=self._job_finished)
+        self.post = PostUploadQueue(self.emit)
+        self.transport = transport or cfg.get("transport", DEFAULT_SETTINGS["transport"])
+        configure_shaper()
+        start_metrics_exporters()
+
+    def _pool_changed(self, stats):
+        METRICS.set("pool_active", stats['active']); METRICS.set("pool_queued", stats['queued'])
+        self.emit(None, "pool", **stats)
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def emit(self, row_id, kind, **data):
+        event = dict(data, row=row_id, kind=kind, ts=time.time())
+        if kind == "log": self.activity.write(data.get('text', ''), row_id)
+        for cb in list(self.listeners):
+            try: cb(event)
+            except Exception as e: print(f"Event Listener Error: {e}")
+
+    def is_running(self, row_id):
+        job = self.jobs.get(row_id)
+        return bool(job and not job.finished)
+
+    def start(self, row_id, config, pause_event=None):
+        with self.lock:
+            if self.is_running(row_id): return False
+            if pause_event is None: pause_event = threading.Event(); pause_event.set()
+            job = RowJob(row_id, config, self, pause_event)
+            self.jobs[row_id] = job
+        self.status.update(row_id, state="running"); self.emit(row_id, "start")
+        job.ui_update("Queued...", "secondary")
+        self.pool.submit(job)
+        return True
+
+    def _job_finished(self, job):
+        job.finished = True
+        self.status.update(job.row_id, state="done"); self.emit(job.row_id, "done")
+
+    def pause(self, row_id):
+        job = self.jobs.get(row_id)
+        if not job or job.finished or not job.pause_event.is_set(): return
+        job.pause_event.clear()
+        self.status.update(row_id, state="paused"); self.emit(row_id, "paused"); job.ui_update("Paused", "warning")
+
+    def resume(self, row_id):
+        job = self.jobs.get(row_id)
+        if not job or job.pause_event.is_set(): return
+        job.pause_event.set()
+        self.status.update(row_id, state="running"); self.emit(row_id, "resumed"); job.ui_update("Resuming...", "secondary")
+        self.pool.wake()
+
+    def wait(self, poll=0.5):
+        # Poll thay vì join() để Ctrl+C vẫn ngắt được tiến trình.
+        while any(self.is_running(r) for r in list(self.jobs)) or self.post.pending(): time.sleep(poll)
+
+def start_metrics_exporters():
+    # metricsPort > 0: endpoint Prometheus ở 127.0.0.1:port/metrics; metricsJson: file snapshot định kỳ.
+    cfg = CURRENT_SETTINGS
+    port = int(cfg.get("metricsPort", DEFAULT_SETTINGS["metricsPort"]) or 0)
+    path = cfg.get("metricsJson", DEFAULT_SETTINGS["metricsJson"])
+    if port:
+        try: metrics.serve(port)
+        except OSError as e: print(f"Metrics endpoint on port {port} failed: {e}")
+    if path: metrics.write_periodically(path, float(cfg.get("metricsInterval", DEFAULT_SETTINGS["metricsInterval"])))
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def print_event(event):
+    ts = datetime.datetime.fromtimestamp(event['ts']).strftime("[%H:%M:%S]")
+    if event['kind'] == "log": print(f"{ts} {event['text']}", flush=True)
+    elif event['kind'] == "status": print(f"{ts} Row {event['row']}: {event['text']}", flush=True)
+    elif event['kind'] == "pool": print(f"{ts} Pool: {event['active']}/{event['workers']} active, {event['queued']} queued", flush=True)
+
+def print_event_json(event):
+    print(json.dumps(event, ensure_ascii=False), flush=True)
+
+def print_plan(jobs):
+    # In lịch đăng dự kiến cho các video đang chờ, không upload gì.
+    booked = get_ledger().booked_times()
+    for key, cfg in jobs:
+        folders = FOLDER_SCANNER.folders(cfg['folder'])
+        rejected = []
+        pending = list(PREFLIGHT.stage(FOLDER_SCANNER.iter_pending(folders, get_ledger().is_done_or_import), lambda data, code, reason: rejected.append((data, reason))))
+        planner = planner_for(cfg['acc'], cfg['time'], cfg['gap'], cfg.get('tz'), booked.get(cfg['acc'], []))
+        print(f"Row {key} [{cfg['acc']}]: {len(pending)} pending, {len(rejected)} invalid, {len(planner.booked)} slot(s) already booked")
+        for data, reason in rejected: print(f"  {'invalid':22}  {data['folder']}: {reason}")
+        for data, when in zip(pending, planner.plan(len(pending))):
+            print(f"  {when.strftime('%Y-%m-%d %H:%M %z')}  {data['title']}")
+
+def print_report(account=None, days=7):
+    since = datetime.datetime.now().astimezone() - datetime.timedelta(days=days)
+    ledger = get_ledger()
+    print(f"Quota used today ({QUOTA.today()} Pacific, resets {QUOTA.next_reset().astimezone().strftime('%H:%M %d/%m')} local):")
+    for r in ledger.quota_report(QUOTA.today()):
+        print(f"  {r['project']:75} {r['units']:6} / {QUOTA.limit(r['project'])}")
+    print(f"Uploads started in the last {days} day(s):")
+    for r in ledger.summary(since):
+        if account and r['account'] != account: continue
+        print(f"  {r['account'] or '-':40} {r['outcome']:10} {r['n']:6} videos {r['bytes'] / 1024 ** 3:9.2f} GB")
+    rows = ledger.history(account=account, since=since)
+    print(f"\nScheduled publish times since {since.strftime('%d/%m %H:%M')}{' for ' + account if account else ''}: {len(rows)}")
+    for r in rows:
+        print(f"  {r['publish_time']}  {r['account'] or '-':30} {r['video_id'] or '-':12} {r['folder']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless YouTube auto uploader (reads grid_state.json + settings.json).")
+    parser.add_argument("--grid", default=GRID_STATE_FILE, help="Grid state file (default: %(default)s)")
+    parser.add_argument("--settings", default=SETTINGS_FILE, help="Settings file (default: %(default)s)")
+    parser.add_argument("--rows", default="", help="Comma separated row numbers to run (default: all checked rows)")
+    parser.add_argument("--json", action="store_true", help="Print events as JSON lines")
+    parser.add_argument("--workers", type=int, help="Max parallel uploads (default: settings maxWorkers)")
+    parser.add_argument("--per-account", type=int, help="Max parallel uploads per account, 0 = unlimited")
+    parser.add_argument("--per-secret", type=int, help="Max parallel uploads per client secret, 0 = unlimited")
+    parser.add_argument("--transport", choices=["thread", "async"], help="Upload transport: one thread per upload or one asyncio loop for all (default: settings transport)")
+    parser.add_argument("--plan", action="store_true", help="Print the publish calendar for pending videos instead of uploading")
+    parser.add_argument("--report", action="store_true", help="Print the upload ledger report instead of uploading")
+    parser.add_argument("--account", help="Report: only this account (token file name)")
+    parser.add_argument("--days", type=int, default=7, help="Report: look back this many days (default: %(default)s)")
+    parser.add_argument("--forget", metavar="FOLDER", help="Mark FOLDER as not uploaded so it is queued again")
+    parser.add_argument("--bandwidth", type=float, metavar="MBPS", help="Cap total upload bandwidth in Mbit/s, shared by row weight (default: settings bandwidthLimitMbps, 0 = off)")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on 127.0.0.1:PORT/metrics (default: settings metricsPort, 0 = off)")
+    parser.add_argument("--metrics-json", metavar="FILE", help="Write a JSON metrics snapshot to FILE periodically and on exit (default: settings metricsJson)")
+    args = parser.parse_args(argv)
+
+    if args.report: print_report(args.account, args.days); return 0
+    if args.forget:
+        n = get_ledger().forget(args.forget)
+        try: os.remove(os.path.join(args.forget, "done.json"))
+        except OSError: pass
+        print(f"{args.forget}: reset {n} upload record(s)."); return 0
+
+    CURRENT_SETTINGS.clear(); CURRENT_SETTINGS.update(load_json(args.settings, DEFAULT_SETTINGS))
+    wanted = {r.strip() for r in args.rows.split(",") if r.strip()}
+
+    jobs = []
+    for key, data in load_grid_rows(args.grid):
+        if wanted and key not in wanted: continue
+        if not wanted and not data.get('chk', True): continue
+        cfg = grid_row_to_job(data)
+        if not all([cfg['secret'], cfg['folder'], cfg['acc'], cfg['time']]):
+            print(f"Row {key}: missing secret/folder/account/time, skipped.", flush=True); continue
+        other = next((k for k, c in jobs if folders_overlap(c['folder'], cfg['folder'])), None)
+        if other is not None:
+            print(f"Row {key}: folder overlaps row {other} ({cfg['folder']}), skipped.", flush=True); continue
+        jobs.append((key, cfg))
+    if args.plan: get_ledger(readonly=True); print_plan(jobs); return 0
+    if args.bandwidth is not None: CURRENT_SETTINGS["bandwidthLimitMbps"] = args.bandwidth
+    if args.metrics_port is not None: CURRENT_SETTINGS["metricsPort"] = args.metrics_port
+    if args.metrics_json is not None: CURRENT_SETTINGS["metricsJson"] = args.metrics_json
+
+    engine = UploadEngine(max_workers=args.workers, max_per_account=args.per_account, max_per_secret=args.per_secret, transport=args.transport)
+    engine.subscribe(print_event_json if args.json else print_event)
+
+    started = 0
+    for key, cfg in jobs: engine.start(key, cfg); started += 1
+
+    if not started: print("No rows to start."); return 1
+    print(f"Started {started} rows.", flush=True)
+    try: engine.wait()
+    except KeyboardInterrupt: print("\nStopped by User."); return 130
+    finally:
+        engine.activity.close()
+        if CURRENT_SETTINGS.get("metricsJson"): METRICS.write_snapshot(CURRENT_SETTINGS["metricsJson"])
+    return 0
+
+if __name__ == "__main__":
+    sys.modules.setdefault("engine", sys.modules["__main__"])  # async_upload import engine -> dùng chung module này.
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import bisect
+import itertools
+import threading
+import http.server
+
+# =============================================================================
+# METRICS
+# =============================================================================
+# Bộ đếm / histogram trong bộ nhớ cho đường upload (không phụ thuộc engine để engine
+# import được). Xuất ra 2 kiểu:
+#   - endpoint HTTP dạng text Prometheus (GET /metrics), dùng cho Prometheus/Grafana;
+#   - file JSON ghi lại định kỳ (ghi file tạm rồi os.replace, không bao giờ đọc dở).
+
+PREFIX = "ytu_"
+THROUGHPUT_BUCKETS = (64e3, 256e3, 1e6, 2.5e6, 5e6, 10e6, 25e6, 50e6, 100e6)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+METRIC_DEFS = {
+    # tên: (loại, mô tả, buckets)
+    "uploads_total": ("counter", "Finished uploads by account and result", None),
+    "upload_bytes_total": ("counter", "Video bytes uploaded by account", None),
+    "upload_bytes_per_second": ("histogram", "Per-upload throughput in bytes/s (file size / wall time incl. retries)", THROUGHPUT_BUCKETS),
+    "chunk_seconds": ("histogram", "Latency of one resumable upload chunk request", LATENCY_BUCKETS),
+    "chunk_bytes_total": ("counter", "Bytes acknowledged by resumable chunk requests", None),
+    "retries_total": ("counter", "Retries scheduled by the retry policy, by cause", None),
+    "retry_giveups_total": ("counter", "Errors not retried (not retryable, attempts or budget exhausted)", None),
+    "quota_units_total": ("counter", "YouTube Data API quota units charged, by project and operation", None),
+    "preflight_rejected_total": ("counter", "Pending videos kept out of the queue by the pre-flight check, by reason", None),
+    "thumbnails_total": ("counter", "Thumbnails handed to the post-upload step, by result (original, prepared, cached, skipped)", None),
+    "pool_active": ("gauge", "Upload steps running", None),
+    "pool_queued": ("gauge", "Row jobs waiting for a worker", None),
+}
+
+def label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items: return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def format_value(v):
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0; self.count = 0
+
+    def observe(self, v):
+        self.counts[bisect.bisect_left(self.buckets, v)] += 1
+        self.sum += v; self.count += 1
+
+class Metrics:
+    def __init__(self, defs=METRIC_DEFS):
+        self.defs = defs
+        self.values = {name: {} for name in defs}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            series = self.values[name]; key = label_key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock: self.values[name][label_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            series = self.values[name]; key = label_key(labels)
+            h = series.get(key)
+            if h is None: h = series[key] = Histogram(self.defs[name][2])
+            h.observe(value)
+
+    def render(self):
+        # Định dạng text exposition 0.0.4 của Prometheus.
+        out = []
+        with self.lock:
+            for name, (kind, desc, buckets) in self.defs.items():
+                full = PREFIX + name
+                out += [f"# HELP {full} {desc}", f"# TYPE {full} {kind}"]
+                for key, v in sorted(self.values[name].items()):
+                    if kind != "histogram": out.append(f"{full}{format_labels(key)} {format_value(v)}"); continue
+                    acc = 0
+                    for le, n in zip(list(buckets) + ["+Inf"], v.counts):
+                        acc += n
+                        out.append(f"{full}_bucket{format_labels(key, [('le', le if le == '+Inf' else format_value(le))])} {acc}")
+                    out.append(f"{full}_sum{format_labels(key)} {format_value(v.sum)}")
+                    out.append(f"{full}_count{format_labels(key)} {v.count}")
+        return "\n".join(out) + "\n"
+
+    def snapshot(self):
+        data = {"ts": time.time(), "uptime": time.time() - self.started, "metrics": {}}
+        with self.lock:
+            for name, (kind, _, buckets) in self.defs.items():
+                rows = []
+                for key, v in sorted(self.values[name].items()):
+                    row = {"labels": dict(key)}
+                    if kind == "histogram":
+                        row.update(count=v.count, sum=v.sum, avg=v.sum / v.count if v.count else None,
+                                   buckets=dict(zip([str(b) for b in buckets] + ["+Inf"], itertools.accumulate(v.counts))))  # Cộng dồn, như "le" của Prometheus.
+                    else: row["value"] = v
+                    rows.append(row)
+                data["metrics"][name] = rows
+        return data
+
+    def write_snapshot(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+METRICS = Metrics()
+
+# =============================================================================
+# EXPORTERS
+# =============================================================================
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry = METRICS
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path in ("/metrics", "/"): body = self.registry.render().encode("utf-8"); ctype = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json": body = json.dumps(self.registry.snapshot()).encode("utf-8"); ctype = "application/json"
+        else: self.send_error(404); return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype); self.send_header("Content-Length", str(len(body)))
+        self.end_headers(); self.wfile.write(body)
+
+    def log_message(self, *args): pass
+
+EXPORTERS = {}
+EXPORTERS_LOCK = threading.Lock()
+
+def serve(port, host="127.0.0.1"):
+    # Chạy một lần cho mỗi cổng; trả về server (server.server_port khi port=0 để OS chọn).
+    with EXPORTERS_LOCK:
+        if ("http", port) in EXPORTERS: return EXPORTERS[("http", port)]
+        server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        EXPORTERS[("http", port)] = server
+        return server
+
+def write_periodically(path, interval=30):
+    with EXPORTERS_LOCK:
+        if ("json", path) in EXPORTERS: return
+        stop = threading.Event(); EXPORTERS[("json", path)] = stop
+    def loop():
+        while not stop.wait(interval):
+            try: METRICS.write_snapshot(path)
+            except OSError as e: print(f"Metrics snapshot error: {e}")
+    threading.Thread(target=loop, name="metrics-json", daemon=True).start()
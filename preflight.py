@@ -0,0 +1,103 @@
+import os
+import struct
+
+# =============================================================================
+# PRE-FLIGHT CHECK (CHẠY TRONG PROCESS CON)
+# =============================================================================
+# Kiểm tra file video trước khi tốn băng thông và 1600 quota cho videos.insert: cấu trúc
+# container MP4 (box nào cũng nằm trọn trong file, có moov, có track hình), thời lượng lấy
+# từ mvhd, dung lượng. Chỉ đọc header các box (vài KB, riêng moov vài MB), không đọc mdat.
+# Module chỉ dùng thư viện chuẩn để process con của ProcessPoolExecutor import nhanh.
+# probe() trả về dữ kiện của file (cache được theo path/size/mtime); giới hạn thời lượng,
+# dung lượng áp ở check() để đổi settings không làm cache cũ sai.
+
+MOOV_MAX = 256 * 1024 * 1024    # moov lớn hơn mức này coi như hỏng (video 12h cỡ vài chục MB).
+CONTAINERS = {b"moov", b"trak", b"mdia", b"edts", b"udta"}
+
+def box_headers(f, start, end):
+    # Duyệt các box trong [start, end): -> (type, offset, header size, box end). Ném ValueError nếu header hỏng.
+    off = start
+    while off + 8 <= end:
+        f.seek(off); head = f.read(16)
+        if len(head) < 8: raise ValueError(f"unreadable box header at byte {off}")
+        size, kind = struct.unpack(">I4s", head[:8]); hdr = 8
+        if size == 1:
+            if len(head) < 16: raise ValueError(f"unreadable box header at byte {off}")
+            size = struct.unpack(">Q", head[8:16])[0]; hdr = 16
+        elif size == 0: size = end - off
+        if size < hdr or not all(32 <= c < 127 for c in kind): raise ValueError(f"corrupt box at byte {off}")
+        yield kind.decode("latin-1"), off, hdr, off + size
+        off += size
+
+def child_boxes(buf, start, end):
+    # Như box_headers nhưng trên bytes của moov đã đọc vào bộ nhớ.
+    off = start
+    while off + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, off); hdr = 8
+        if size == 1: size = struct.unpack_from(">Q", buf, off + 8)[0]; hdr = 16
+        elif size == 0: size = end - off
+        if size < hdr or off + size > end: raise ValueError(f"corrupt '{kind.decode('latin-1', 'replace')}' box inside moov")
+        yield kind, off + hdr, off + size
+        off += size
+
+def parse_moov(buf):
+    # -> (thời lượng giây hoặc None nếu không rõ, có track hình không, có track tiếng không, fragmented)
+    duration = None; handlers = set(); fragmented = False
+    def walk(start, end):
+        nonlocal duration, fragmented
+        for kind, body, stop in child_boxes(buf, start, end):
+            if kind == b"mvhd":
+                if buf[body] == 1: scale, dur = struct.unpack_from(">IQ", buf, body + 20); unknown = dur == 2 ** 64 - 1
+                else: scale, dur = struct.unpack_from(">II", buf, body + 12); unknown = dur == 2 ** 32 - 1
+                if scale and not unknown: duration = dur / scale
+            elif kind == b"hdlr": handlers.add(bytes(buf[body + 8:body + 12]))
+            elif kind == b"mvex": fragmented = True
+            elif kind in CONTAINERS: walk(body, stop)
+    walk(0, len(buf))
+    return duration, b"vide" in handlers, b"soun" in handlers, fragmented
+
+def probe_mp4(f, size):
+    info = {"kind": "mp4", "size": size, "duration": None, "has_video": False, "code": None, "reason": None}
+    moov = None; fragments = False
+    try:
+        for kind, off, hdr, end in box_headers(f, 0, size):
+            if end > size:
+                info.update(code="truncated", reason=f"truncated: '{kind}' box needs {end} bytes but the file has {size}"); return info
+            if kind == "moov":
+                if end - off - hdr > MOOV_MAX: info.update(code="corrupt", reason=f"moov box is {(end - off) >> 20} MB"); return info
+                f.seek(off + hdr); moov = f.read(end - off - hdr)
+            elif kind == "moof": fragments = True
+        if moov is None: info.update(code="no_moov", reason="no 'moov' atom (recording not finalized or file cut short)"); return info
+        duration, video, audio, fragmented = parse_moov(memoryview(moov))
+    except (ValueError, struct.error) as e:
+        info.update(code="corrupt", reason=f"not a valid MP4: {e}"); return info
+    info.update(duration=duration, has_video=video)
+    if not video: info.update(code="no_video", reason="audio-only MP4 (no video track)" if audio else "no video track")
+    elif not duration and not (fragmented or fragments): info.update(code="no_duration", reason="zero duration")
+    return info
+
+def probe(path):
+    # Chạy trong process con. Lỗi đọc file -> code "unreadable" (không cache, lần sau thử lại).
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0: return {"kind": ext[1:], "size": 0, "duration": None, "has_video": False, "code": "empty", "reason": "empty file"}
+            if ext == ".mp4": return probe_mp4(f, size)
+    except OSError as e:
+        return {"kind": ext[1:], "size": None, "duration": None, "has_video": False, "code": "unreadable", "reason": f"cannot read: {e.strerror or e}"}
+    if ext == ".mp3": return {"kind": "mp3", "size": size, "duration": None, "has_video": False, "code": "audio_only", "reason": "audio-only MP3, YouTube needs a video track"}
+    return {"kind": ext[1:], "size": size, "duration": None, "has_video": True, "code": None, "reason": None}
+
+def check(info, max_seconds=0, max_bytes=0):
+    # -> (code, lý do) nếu không upload được, None nếu ổn. Giới hạn = 0 -> bỏ qua.
+    if info.get("code"): return info["code"], info["reason"]
+    if max_bytes and info.get("size") and info["size"] > max_bytes:
+        return "too_large", f"{info['size'] / 1024 ** 3:.1f} GB is over the {max_bytes / 1024 ** 3:g} GB limit"
+    if max_seconds and info.get("duration") and info["duration"] > max_seconds:
+        return "too_long", f"{format_duration(info['duration'])} is over the {format_duration(max_seconds)} limit"
+    return None
+
+def format_duration(seconds):
+    s = int(seconds)
+    return f"{s // 3600}:{s // 60 % 60:02d}:{s % 60:02d}"
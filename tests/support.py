@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Engine tạo thư mục (user_tokens, client_secrets, logs...) và file trạng thái trong thư mục
+# hiện tại -> test chạy trong một thư mục tạm, không đụng dữ liệu thật cạnh repo.
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="ayt-test-")
+if REPO not in sys.path: sys.path.insert(0, REPO)
+os.chdir(WORKDIR)
+
+import engine
@@ -0,0 +1,67 @@
+import os
+import json
+import time
+import uuid
+import tempfile
+import unittest
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from support import engine
+from metrics import METRICS
+
+class DedupRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.reg = engine.DedupRegistry()
+        self.folder = tempfile.mkdtemp(prefix="v0001-")
+
+    def test_two_rows_same_folder_only_first_owns(self):
+        first = self.reg.claim("hash", "1", self.folder)
+        second = self.reg.claim("hash", "2", self.folder)
+        self.assertEqual(first, ("1", engine.folder_key(self.folder)))
+        self.assertEqual(second, first)  # Dòng 2 thấy video đã thuộc dòng 1 -> bỏ qua.
+        # Chính dòng 1 claim lại (thử lại sau lỗi) vẫn là chủ.
+        self.assertEqual(self.reg.claim("hash", "1", self.folder), first)
+
+    def test_release_only_by_owner_row(self):
+        self.reg.claim("hash", "1", self.folder)
+        self.reg.release("hash", "2", self.folder)
+        self.assertEqual(self.reg.claim("hash", "2", self.folder)[0], "1")
+        self.reg.release("hash", "1", self.folder)
+        self.assertEqual(self.reg.claim("hash", "2", self.folder)[0], "2")
+
+class QuotaDeferTest(unittest.TestCase):
+    def test_quota_exceeded_keeps_claim_and_counts_deferred(self):
+        # Hết quota giữa chừng: video chờ tới giờ reset, dòng khác không được claim nó.
+        account = f"defer-{uuid.uuid4().hex}.json"; project = f"defer-{uuid.uuid4().hex}"
+        folder = tempfile.mkdtemp(); digest = uuid.uuid4().hex
+        eng = engine.UploadEngine()
+        try:
+            job = engine.RowJob("7", {"acc": account, "secret": "s.json", "folder": folder, "time": "08:00", "gap": 0}, eng, None)
+            job.project = project; job.planner = engine.SchedulePlanner("08:00")
+            pub_time = job.planner.next()
+            attempt = engine.get_ledger().begin(folder, os.path.join(folder, "v.mp4"), account, "s.json", pub_time, 1, digest)
+            engine.DEDUP_REGISTRY.claim(digest, "7", folder)
+            ctx = {"data": {"folder": folder, "video": os.path.join(folder, "v.mp4"), "title": "v"}, "digest": digest,
+                   "quota": engine.QUOTA.reserve(project, 1700), "pub_time": pub_time, "prev_cursor": None, "attempt": attempt, "size": 1, "t0": time.monotonic()}
+            error = HttpError(httplib2.Response({"status": 403}), json.dumps({"error": {"errors": [{"reason": "quotaExceeded"}]}}).encode())
+            self.assertTrue(job.finish_upload(ctx, error=error))
+            self.assertGreater(job.not_before, time.monotonic())
+            self.assertEqual(engine.DEDUP_REGISTRY.claim(digest, "8", folder)[0], "7")
+            rows = METRICS.snapshot()["metrics"]["uploads_total"]
+            self.assertEqual({r["labels"]["result"] for r in rows if r["labels"].get("account") == account}, {"deferred"})
+        finally: eng.activity.close()
+
+class FoldersOverlapTest(unittest.TestCase):
+    def test_overlap(self):
+        root = tempfile.mkdtemp()
+        sub = os.path.join(root, "channel", "batch1")
+        self.assertTrue(engine.folders_overlap(root, root + os.sep))
+        self.assertTrue(engine.folders_overlap(root, sub))
+        self.assertTrue(engine.folders_overlap(sub, root))
+        self.assertFalse(engine.folders_overlap(os.path.join(root, "a"), os.path.join(root, "ab")))
+        self.assertFalse(engine.folders_overlap(os.path.join(root, "a"), os.path.join(root, "b")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+import httplib2
+
+from support import REPO, engine
+
+sys.path.insert(0, os.path.join(REPO, "bench"))
+import uploads
+from fake_youtube import FakeYouTube, make_certificate
+
+MB = 1024 * 1024
+
+def wait_for(cond, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline: raise AssertionError("timed out")
+        time.sleep(0.02)
+
+class PauseTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.work, self.jobs = uploads.make_workdir({"rows": 1, "files": 1, "size": 8 * MB})
+        os.chdir(self.work)
+        # googleapiclient luôn upload qua https -> server giả chạy TLS, httplib2 tin chứng chỉ tự ký của nó.
+        self.cert_dir = tempfile.mkdtemp()
+        cert, key = make_certificate(self.cert_dir)
+        self.ca_certs = httplib2.CA_CERTS; httplib2.CA_CERTS = cert
+        self.fake = FakeYouTube(bandwidth=4 * MB).start(certfile=cert, keyfile=key)
+        self.settings = dict(engine.CURRENT_SETTINGS)
+        engine.CURRENT_SETTINGS.update(apiEndpoint=self.fake.url, transport="thread", maxWorkers=2, maxPerAccount=1, chunkMinMB=1, chunkMaxMB=1,
+                                       quotaPerProject=10 ** 9, writeDoneJson=False, bandwidthLimitMbps=0)
+        engine.POST_FIRST_DELAY = 0.0
+
+    def tearDown(self):
+        self.fake.stop(); httplib2.CA_CERTS = self.ca_certs
+        shutil.rmtree(self.cert_dir, ignore_errors=True)
+        engine.CURRENT_SETTINGS.clear(); engine.CURRENT_SETTINGS.update(self.settings)
+        os.chdir(self.cwd); shutil.rmtree(self.work, ignore_errors=True)
+
+    def test_pause_frees_worker_and_resumes_session(self):
+        eng = engine.UploadEngine()
+        key, cfg = self.jobs[0]
+        eng.start(key, cfg)
+        job = eng.jobs[key]
+        wait_for(lambda: any(s["got"] >= 2 * MB for s in list(self.fake.sessions.values())))
+        eng.pause(key)
+
+        # Upload dở được cất lại, luồng pool rảnh, pool không chạy dòng đang Pause.
+        wait_for(lambda: job.parked is not None and eng.pool.stats()["active"] == 0)
+        time.sleep(0.3)
+        self.assertEqual(eng.pool.stats()["active"], 0)
+        offset = engine.load_upload_session(job.parked["data"]["folder"], job.parked["data"]["video"], cfg["acc"])["offset"]
+        self.assertGreater(offset, 0)
+
+        eng.resume(key)
+        wait_for(lambda: job.finished and not eng.post.pending())
+        eng.activity.close()
+        st = self.fake.stats()
+        self.assertEqual(st["videos"], 1)
+        self.assertEqual(len(self.fake.sessions), 1)  # Gửi tiếp trên phiên cũ, không mở phiên mới.
+        self.assertLess(st["bytes_in"], 8 * MB + 2 * MB)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import random
+import shutil
+import sqlite3
+import tempfile
+import subprocess
+import unittest
+
+from support import REPO
+
+sys.path.insert(0, os.path.join(REPO, "bench"))
+import uploads
+
+class PlanReadOnlyTest(unittest.TestCase):
+    # --plan chỉ đọc ledger: không tạo uploads.db, không nhập done.json, không ghi cache pre-flight.
+    def setUp(self):
+        self.work = tempfile.mkdtemp(prefix="ayt-plan-")
+        root = os.path.join(self.work, "videos")
+        for name in ("v1", "v2"): os.makedirs(os.path.join(root, name))
+        with open(os.path.join(root, "v1", "video.mp4"), "wb") as f: uploads.write_fake_mp4(f, 64 * 1024, random.Random(1))
+        with open(os.path.join(root, "v2", "video.mp4"), "wb") as f: uploads.write_fake_mp4(f, 64 * 1024, random.Random(2))
+        with open(os.path.join(root, "v2", "done.json"), "w") as f: json.dump({"video_id": "abc", "account": "a.json"}, f)
+        with open(os.path.join(self.work, "grid.json"), "w") as f:
+            json.dump({"1": {"secret": "s.json", "folder": root, "acc": "a.json", "time": "08:00", "chk": True}}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def plan(self):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in (REPO, os.environ.get("PYTHONPATH")) if p))
+        proc = subprocess.run([sys.executable, os.path.join(REPO, "engine.py"), "--grid", "grid.json", "--plan"],
+                              cwd=self.work, env=env, capture_output=True, text=True, timeout=120)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        return proc.stdout
+
+    def counts(self):
+        conn = sqlite3.connect(os.path.join(self.work, "uploads.db"))
+        try: return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("uploads", "fingerprints", "preflight", "quota_usage")}
+        finally: conn.close()
+
+    def test_plan_without_ledger_creates_nothing(self):
+        out = self.plan()
+        self.assertIn("1 pending", out)
+        self.assertFalse(os.path.exists(os.path.join(self.work, "uploads.db")))
+
+    def test_plan_does_not_write_existing_ledger(self):
+        sys.path.insert(0, REPO)
+        import engine
+        engine.UploadLedger(os.path.join(self.work, "uploads.db")).conn.close()
+        before = self.counts()
+        out = self.plan()
+        self.assertIn("1 pending", out)
+        self.assertEqual(self.counts(), before)
+
+if __name__ == "__main__":
+    unittest.main()
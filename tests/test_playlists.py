@@ -0,0 +1,43 @@
+import os
+import time
+import threading
+import unittest
+
+from support import WORKDIR, engine
+
+class PlaylistCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.catalog = engine.PlaylistCatalog(os.path.join(WORKDIR, "playlists-test.json"), ttl=60)
+        self.catalog.entries = {"a.json": {"etag": "e1", "fetched": time.time() - 3600, "playlists": {"Old": "PL1"}},
+                                "b.json": {"etag": "e2", "fetched": time.time(), "playlists": {"Fresh": "PL2"}}}
+        self.calls = []; self.gate = threading.Event()
+        def get(account, secret, force=False):
+            self.calls.append(account); self.gate.wait(5)
+            return {"New": "PL3"}
+        self.catalog.get = get
+
+    def test_stale_served_and_refreshed_once_per_account(self):
+        got = []; done = threading.Event()
+        def on_refresh(pls):
+            got.append(pls)
+            if len(got) == 10: done.set()
+        # 10 dòng cùng tài khoản mở grid sau khi cache hết hạn.
+        served = [self.catalog.refresh("a.json", "s.json", callback=on_refresh) for _ in range(10)]
+        self.assertEqual(served, [{"Old": "PL1"}] * 10)
+        self.gate.set()
+        self.assertTrue(done.wait(5))
+        self.assertEqual(self.calls, ["a.json"])
+        self.assertEqual(got, [{"New": "PL3"}] * 10)
+
+    def test_fresh_cache_does_not_refresh(self):
+        self.assertEqual(self.catalog.refresh("b.json", "s.json", callback=lambda pls: self.fail("refreshed")), {"Fresh": "PL2"})
+        self.assertEqual(self.calls, [])
+
+    def test_force_refreshes_fresh_cache(self):
+        done = threading.Event(); self.gate.set()
+        self.assertEqual(self.catalog.refresh("b.json", "s.json", force=True, callback=lambda pls: done.set()), {"Fresh": "PL2"})
+        self.assertTrue(done.wait(5))
+        self.assertEqual(self.calls, ["b.json"])
+
+if __name__ == "__main__":
+    unittest.main()
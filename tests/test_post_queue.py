@@ -0,0 +1,77 @@
+import json
+import time
+import uuid
+import threading
+import unittest
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from support import engine
+from metrics import METRICS
+
+def http_error(status, reason="", retry_after=None):
+    headers = {"status": status}
+    if retry_after is not None: headers["retry-after"] = str(retry_after)
+    content = json.dumps({"error": {"code": status, "errors": [{"reason": reason}] if reason else []}}).encode()
+    return HttpError(httplib2.Response(headers), content)
+
+class FakeRequest:
+    def __init__(self, errors): self.errors = errors; self.times = []
+
+    def execute(self):
+        self.times.append(time.monotonic())
+        if self.errors: raise self.errors.pop(0)
+        return {}
+
+class PostUploadQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.account = f"post-{uuid.uuid4().hex}.json"
+        self.logs = []; self.finished = threading.Event()
+        def emit(row_id, kind, **data):
+            self.logs.append(data.get("text", ""))
+            if "OK" in data.get("text", "") or "FAILED" in data.get("text", ""): self.finished.set()
+        self.queue = engine.PostUploadQueue(emit)
+        self.saved = engine.POST_RETRY_MIN, engine.RETRY_POLICY.base_delay
+        engine.POST_RETRY_MIN = 0.0; engine.RETRY_POLICY.base_delay = 0.01
+
+    def tearDown(self):
+        engine.POST_RETRY_MIN, engine.RETRY_POLICY.base_delay = self.saved
+
+    def run_task(self, request):
+        self.queue.submit(engine.PostTask("1", "playlistItems.insert", lambda: request, "Playlist", self.account, None))
+        self.assertTrue(self.finished.wait(10))
+
+    def retries(self):
+        rows = METRICS.snapshot()["metrics"]["retries_total"]
+        return sum(r["value"] for r in rows if r["labels"].get("account") == self.account)
+
+    def test_retries_go_through_policy(self):
+        request = FakeRequest([http_error(503, retry_after=0.3), http_error(404, "videoNotFound")])
+        self.run_task(request)
+        self.assertIn("   -> Playlist: OK", self.logs)
+        self.assertEqual(len(request.times), 3)
+        self.assertEqual(self.retries(), 2)
+        self.assertGreaterEqual(request.times[1] - request.times[0], 0.3)  # Retry-After được tôn trọng.
+
+    def test_permanent_error_not_retried(self):
+        request = FakeRequest([http_error(400, "invalidValue")])
+        self.run_task(request)
+        self.assertEqual(len(request.times), 1)
+        self.assertEqual(self.retries(), 0)
+        self.assertTrue(any("FAILED after 1 tries" in l for l in self.logs))
+
+    def test_quota_exceeded_uses_secret_override(self):
+        # quotaOverrides khoá theo client secret: hết quota ở bước nền thì ghi đúng hạn mức của secret.
+        project = f"post-{uuid.uuid4().hex}"; secret = f"{project}.json"
+        engine.CURRENT_SETTINGS["quotaOverrides"] = {secret: 3000}
+        try:
+            request = FakeRequest([http_error(403, "quotaExceeded")])
+            self.queue.submit(engine.PostTask("1", "thumbnails.set", lambda: request, "Thumbnail", self.account, project, secret=secret))
+            deadline = time.monotonic() + 10
+            while engine.QUOTA.used(project) < 3000 and time.monotonic() < deadline: time.sleep(0.02)
+            self.assertEqual(engine.QUOTA.used(project), 3000)
+        finally: engine.CURRENT_SETTINGS.pop("quotaOverrides", None)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import uuid
+import threading
+import unittest
+
+from support import engine
+
+QUOTA = engine.QUOTA
+INSERT = engine.QUOTA_COSTS["videos.insert"]
+THUMB = engine.QUOTA_COSTS["thumbnails.set"]
+PLAYLIST = engine.QUOTA_COSTS["playlistItems.insert"]
+COST = INSERT + THUMB + PLAYLIST
+
+class QuotaReservationTest(unittest.TestCase):
+    def setUp(self):
+        self.project = f"test-{uuid.uuid4().hex}"
+        engine.CURRENT_SETTINGS["quotaOverrides"] = {self.project: 10000}
+
+    def tearDown(self):
+        engine.CURRENT_SETTINGS.pop("quotaOverrides", None)
+
+    def run_rows(self, n, body):
+        barrier = threading.Barrier(n)
+        def row():
+            barrier.wait(); body()
+        threads = [threading.Thread(target=row) for _ in range(n)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+    def test_charge_draws_from_reservation(self):
+        # 5 dòng giữ chỗ 1700 song song, rồi cùng videos.insert: remaining không được trừ 2 lần.
+        holds = []
+        self.run_rows(5, lambda: holds.append(QUOTA.reserve(self.project, COST)))
+        self.assertEqual(len(holds), 5); self.assertNotIn(None, holds)
+        self.assertEqual(QUOTA.remaining(self.project), 10000 - 5 * COST)
+
+        it = iter(holds)
+        self.run_rows(5, lambda: QUOTA.charge(self.project, "videos.insert", reservation=next(it)))
+        self.assertEqual(QUOTA.used(self.project), 5 * INSERT)
+        self.assertEqual(QUOTA.remaining(self.project), 10000 - 5 * COST)
+        # Phần còn lại (1500) vẫn dùng được cho dòng thứ 6 có ít quota hơn.
+        extra = QUOTA.reserve(self.project, 10000 - 5 * COST)
+        self.assertIsNotNone(extra); QUOTA.release(extra)
+
+        # Thumbnail + playlist chạy ở PostUploadQueue với phần tách ra, rồi dòng trả phần thừa.
+        posts = [(QUOTA.split(h, THUMB), QUOTA.split(h, PLAYLIST)) for h in holds]
+        it = iter(posts)
+        def post():
+            thumb, playlist = next(it)
+            QUOTA.charge(self.project, "thumbnails.set", reservation=thumb); QUOTA.release(thumb)
+            QUOTA.charge(self.project, "playlistItems.insert", reservation=playlist); QUOTA.release(playlist)
+        self.run_rows(5, post)
+        for h in holds: QUOTA.release(h)
+        self.assertEqual(QUOTA.reserved[self.project], 0)
+        self.assertEqual(QUOTA.remaining(self.project), 10000 - 5 * COST)
+
+    def test_release_returns_unused_units(self):
+        # Video không có thumbnail/playlist: chỉ insert bị trừ, 100 đơn vị giữ thừa được trả lại.
+        holds = []
+        self.run_rows(4, lambda: holds.append(QUOTA.reserve(self.project, COST)))
+        it = iter(holds)
+        def row():
+            h = next(it); QUOTA.charge(self.project, "videos.insert", reservation=h); QUOTA.release(h)
+        self.run_rows(4, row)
+        self.assertEqual(QUOTA.remaining(self.project), 10000 - 4 * INSERT)
+
+    def test_reserve_refuses_when_full(self):
+        holds = []
+        self.run_rows(8, lambda: holds.append(QUOTA.reserve(self.project, COST)))
+        self.assertEqual(sum(h is not None for h in holds), 10000 // COST)
+        for h in holds: QUOTA.release(h)
+        self.assertEqual(QUOTA.remaining(self.project), 10000)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+import ssl
+import socket
+import unittest
+
+from support import engine
+from metrics import METRICS
+
+class ClassifyTest(unittest.TestCase):
+    def test_network_errors_retried(self):
+        for e in (ConnectionResetError(), TimeoutError(), socket.gaierror(), socket.timeout()):
+            self.assertTrue(engine.RETRY_POLICY.classify(e)[0], repr(e))
+
+    def test_local_errors_not_retried(self):
+        for e in (FileNotFoundError(2, "No such file"), PermissionError(13, "Denied"), IsADirectoryError(21, "Is a directory"),
+                  ssl.SSLCertVerificationError("certificate verify failed")):
+            self.assertFalse(engine.RETRY_POLICY.classify(e)[0], repr(e))
+
+    def test_missing_file_fails_at_once(self):
+        calls = []
+        def fn():
+            calls.append(1); raise FileNotFoundError(2, "No such file", "video.mp4")
+        account = "retry-test.json"
+        with self.assertRaises(FileNotFoundError): engine.RETRY_POLICY.call(fn, account)
+        self.assertEqual(len(calls), 1)
+        rows = METRICS.snapshot()["metrics"]["retries_total"]
+        self.assertEqual(sum(r["value"] for r in rows if r["labels"].get("account") == account), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import threading
+import unittest
+import http.server
+
+from support import engine
+from google.oauth2.credentials import Credentials
+
+class ResumableHandler(http.server.BaseHTTPRequestHandler):
+    # PUT /upload -> 308 "Resume Incomplete" như YouTube; ghi lại mọi path được gọi.
+    hits = []
+    location = None
+
+    def do_PUT(self):
+        self.hits.append(self.path)
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.send_response(308)
+        self.send_header("Range", "bytes=0-9")
+        if self.location: self.send_header("Location", self.location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args): pass
+
+class AuthorizedHttpTest(unittest.TestCase):
+    def setUp(self):
+        ResumableHandler.hits = []
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ResumableHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown(); self.server.server_close()
+        ResumableHandler.location = None
+
+    def put(self):
+        http = engine.authorized_http(Credentials(token="test-token"))
+        return http.request(self.url + "/upload", "PUT", body=b"0123456789", headers={"Content-Length": "10"})
+
+    def test_308_without_location_is_returned(self):
+        resp, _ = self.put()
+        self.assertEqual(resp.status, 308)
+        self.assertEqual(resp["range"], "bytes=0-9")
+
+    def test_308_with_location_is_not_followed(self):
+        ResumableHandler.location = "/elsewhere"
+        resp, _ = self.put()
+        self.assertEqual(resp.status, 308)
+        self.assertEqual(ResumableHandler.hits, ["/upload"])
+
+if __name__ == "__main__":
+    unittest.main()
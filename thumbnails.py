@@ -0,0 +1,69 @@
+import io
+import os
+import hashlib
+import importlib.util
+
+# =============================================================================
+# THUMBNAIL PREPARE (CHẠY TRONG PROCESS CON)
+# =============================================================================
+# Đưa ảnh thumbnail về đúng chuẩn của thumbnails.set trước khi upload video: tối đa 2 MB,
+# 16:9, rộng ít nhất 640 px. Ảnh đã đạt chuẩn được gửi nguyên bản; ảnh khác được xoay theo
+# EXIF, thu/phóng vào khung 1280x720 (thêm viền đen thay vì cắt mất chữ), nén JPEG giảm dần
+# chất lượng tới khi dưới 2 MB. Kết quả lưu trong cache_dir theo hash nội dung ảnh gốc nên
+# ảnh dùng lại cho nhiều video hoặc chạy lại sau khi khởi động chỉ tốn một lần băm.
+# Pillow là tuỳ chọn: không có thì chỉ gửi được ảnh gốc đã dưới 2 MB.
+
+MAX_BYTES = 2 * 1024 * 1024
+SIZE = (1280, 720)
+MIN_WIDTH = 640
+QUALITIES = (90, 85, 80, 75, 70, 60, 50, 40)
+SPEC = "v1"  # Đổi khi đổi cách xử lý -> cache cũ tự bỏ.
+
+def format_size(n):
+    return f"{n / 1024 ** 2:.1f} MB" if n >= 1024 ** 2 else f"{n / 1024:.0f} KB"
+
+def have_pillow():
+    return importlib.util.find_spec("PIL") is not None
+
+def compliant(im, nbytes):
+    w, h = im.size
+    return nbytes <= MAX_BYTES and w >= MIN_WIDTH and abs(w * 9 - h * 16) <= w * 9 // 100 and im.format in ("JPEG", "PNG")
+
+def encode(im):
+    from PIL import Image, ImageOps
+    im = ImageOps.exif_transpose(im)
+    if im.mode != "RGB":
+        rgba = im.convert("RGBA"); im = Image.new("RGB", rgba.size, (0, 0, 0)); im.paste(rgba, mask=rgba.getchannel("A"))
+    im = ImageOps.pad(im, SIZE, method=Image.LANCZOS, color=(0, 0, 0))
+    for q in QUALITIES:
+        buf = io.BytesIO(); im.save(buf, "JPEG", quality=q, optimize=True, progressive=True)
+        if buf.tell() <= MAX_BYTES: return buf.getvalue(), q
+    return None, None
+
+def prepare(src, cache_dir):
+    # -> {"path": file gửi lên (None = không gửi được), "reason": lý do, "note": mô tả thay đổi, "cached": bool}
+    try:
+        with open(src, "rb") as f: data = f.read()
+    except OSError as e: return {"path": None, "reason": f"cannot read: {e.strerror or e}", "note": None, "cached": False}
+    digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+    out = os.path.join(cache_dir, SPEC, digest[:2], digest + ".jpg")
+    if os.path.exists(out): return {"path": out, "reason": None, "note": "prepared earlier", "cached": True}
+    if not have_pillow():
+        if len(data) <= MAX_BYTES: return {"path": src, "reason": None, "note": None, "cached": False}
+        return {"path": None, "reason": f"{format_size(len(data))} is over the 2 MB limit (install Pillow to shrink it)", "note": None, "cached": False}
+
+    from PIL import Image, UnidentifiedImageError
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            if compliant(im, len(data)): return {"path": src, "reason": None, "note": None, "cached": False}
+            before = f"{im.size[0]}x{im.size[1]} {im.format} {format_size(len(data))}"
+            jpeg, q = encode(im)
+    except UnidentifiedImageError: return {"path": None, "reason": "not a readable image", "note": None, "cached": False}
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return {"path": None, "reason": f"not a readable image: {e}", "note": None, "cached": False}
+    if jpeg is None: return {"path": None, "reason": "cannot compress under 2 MB", "note": None, "cached": False}
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    tmp = f"{out}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f: f.write(jpeg)
+    os.replace(tmp, out)
+    return {"path": out, "reason": None, "note": f"{before} -> {SIZE[0]}x{SIZE[1]} JPEG q{q} {format_size(len(jpeg))}", "cached": False}